@@ -1,14 +1,31 @@
 from datetime import datetime, timedelta, timezone
 from django.utils.timezone import now, localtime
 from django.db.models import Avg, Sum, Count
-from openai import OpenAI
-from core.models import AIHealthTrend, FitnessActivity, CustomUser, GlucoseCheck, GlucoseLog
+from core.models import AIHealthTrend, FitnessActivity, CustomUser
+from core.services.daily_stats import period_summary
+from core.services.llm_gateway import chat_completion
 from django.db.models import Q
+import hashlib
 import re
 
 
 
-client = OpenAI()
+# Activities the dashboard recommendation is generated from
+RECOMMENDATION_ACTIVITIES = 5
+
+
+def recommendation_activities(user):
+    return list(FitnessActivity.objects.filter(user=user).order_by("-start_time")[:RECOMMENDATION_ACTIVITIES])
+
+
+def activity_fingerprint(fitness_activities):
+    """Hash of everything generate_ai_recommendation reads from the activities; a new one means the prompt changed."""
+    parts = [
+        f"{a.pk}|{a.activity_type}|{a.duration_minutes}|{a.start_time.isoformat()}|{a.is_fallback}"
+        for a in fitness_activities
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
 
 def generate_ai_recommendation(user, fitness_activities):
     """
@@ -39,7 +56,7 @@ def generate_ai_recommendation(user, fitness_activities):
     Return in bullet-point format.
     """
 
-    response = client.chat.completions.create(
+    return chat_completion(
         model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": "You are an AI fitness coach specializing in diabetic health advice."},
@@ -47,8 +64,6 @@ def generate_ai_recommendation(user, fitness_activities):
         ],
     )
 
-    return response.choices[0].message.content
-
 def generate_health_trends(user, period_type="weekly"):
     """
     Generates user-specific health trends and AI insights.
@@ -64,55 +79,22 @@ def generate_health_trends(user, period_type="weekly"):
     print(f"Generating trends for: {user.username}")
     print(f"Period: {start_date} to {end_date}")
 
-    # 🏃 Fitness data
-    activities = FitnessActivity.objects.filter(
-        user=user,
-        start_time__date__range=[start_date, end_date]
-    )
-    print(f"Total activities found: {activities.count()}")
-
-    sleep_activities = activities.filter(Q(activity_type__iexact="sleep") | Q(activity_type__iexact="sleeping"))
-    print(f"Sleep-related activities: {sleep_activities.count()}")
+    # 🧮 Aggregates: one DailyUserStats row per day of the period
+    period = period_summary(user, start_date, end_date)
+    print(f"Days with data: {period['days']}")
 
-    valid_activities = activities.exclude(Q(activity_type__iexact="sleep") | Q(is_fallback=True))
-    print(f"Valid non-sleep activities (excluding fallback): {valid_activities.count()}")
-    for activity in valid_activities:
-        print(f" - {activity.activity_type} | {activity.start_time} | Steps: {activity.steps}, HR: {activity.heart_rate}")
-
-    # 🧮 Aggregates
-    avg_steps = valid_activities.aggregate(Sum("steps"))["steps__sum"] or 0
-    avg_hr = valid_activities.aggregate(Avg("heart_rate"))["heart_rate__avg"]
-    # avg_sleep = sleep_activities.aggregate(Avg("total_sleep_hours"))["total_sleep_hours__avg"] or 0
-    total_sessions = valid_activities.count()
+    # Fitness totals leave out fallback records and sleep
+    avg_steps = period["steps"]
+    avg_hr = period["avg_heart_rate"]
+    total_sessions = period["activity_count"]
 
     print(f"Avg Steps: {avg_steps}")
     print(f"Avg Heart Rate: {avg_hr}")
-    # print(f"Avg Sleep: {avg_sleep}")
     print(f"Total Exercise Sessions: {total_sessions}")
 
     # 🩸 Glucose
-    log_glucose = GlucoseLog.objects.filter(
-    user=user,
-    timestamp__range=[
-        datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc),
-        datetime.combine(end_date, datetime.max.time(), tzinfo=timezone.utc)
-    ]
-    ).values_list("glucose_level", flat=True)
-
-    check_glucose = GlucoseCheck.objects.filter(
-        session__user=user,
-        timestamp__range=[
-            datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc),
-            datetime.combine(end_date, datetime.max.time(), tzinfo=timezone.utc)
-        ]
-    ).values_list("glucose_level", flat=True)
-
-    all_glucose = [g for g in (list(log_glucose) + list(check_glucose)) if g is not None]
-    avg_glucose = (
-        sum(all_glucose) / len(all_glucose)
-        if all_glucose else None
-    )
-    print(f"Glucose entries: {len(all_glucose)}")
+    avg_glucose = period["avg_glucose"]
+    print(f"Glucose entries: {period['glucose_count']}")
     print(f"Avg Glucose: {avg_glucose}")
 
     # 🤖 Prompt
@@ -139,15 +121,13 @@ def generate_health_trends(user, period_type="weekly"):
     """
     print("Sending prompt to GPT...")
 
-    response = client.chat.completions.create(
+    summary = chat_completion(
         model="gpt-4",
         messages=[
             {"role": "system", "content": "You are an AI fitness coach for people managing diabetes."},
             {"role": "user", "content": trend_prompt},
         ],
-    )
-
-    summary = response.choices[0].message.content.strip()
+    ).strip()
     parsed_summary = parse_ai_summary_with_scores(summary)
     print("AI Summary:")
     print(summary)
@@ -0,0 +1,62 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from core import partitioning
+from core.models import GlucoseReading
+
+
+def retention_months():
+    """Months each partitioned table keeps live, from settings; 0 keeps everything."""
+    return {
+        "core_glucoselog": settings.GLUCOSE_LOG_RETENTION_MONTHS,
+        "core_fitnessactivity": settings.FITNESS_ACTIVITY_RETENTION_MONTHS,
+    }
+
+
+def remove_archived_readings(cursor, table, name):
+    # GlucoseReading mirrors the live logs, so readings of archived logs go with them
+    if table == "core_glucoselog":
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(GlucoseReading._meta.db_table)} "
+            f"WHERE source = 'log' AND source_id IN "
+            f"(SELECT \"logID\" FROM {partitioning.ARCHIVE_SCHEMA}.{connection.ops.quote_name(name)})"
+        )
+
+
+class Command(BaseCommand):
+    help = "Apply the retention policy: detach monthly partitions older than the retention window into the archive schema."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List the partitions that would be archived')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            self.stdout.write("⚠️ Partitioning needs PostgreSQL; nothing to do")
+            return
+
+        current = partitioning.month_start(date.today())
+        archived = 0
+
+        with connection.cursor() as cursor:
+            for table, months in retention_months().items():
+                if not months or not partitioning.is_partitioned(cursor, table):
+                    continue
+                cutoff = partitioning.add_months(current, -months)
+                expired = [
+                    name for name in partitioning.list_partitions(cursor, table)
+                    if partitioning.month_of_partition(table, name) < cutoff
+                ]
+
+                for name in expired:
+                    if options['dry_run']:
+                        self.stdout.write(f"📦 Would archive {name}")
+                        continue
+                    # Detaching briefly locks the parent table; one partition per transaction keeps it short
+                    with transaction.atomic():
+                        partitioning.archive_partition(cursor, table, name)
+                        remove_archived_readings(cursor, table, name)
+                    self.stdout.write(f"📦 Archived {name} to {partitioning.ARCHIVE_SCHEMA}.{name}")
+                    archived += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Archived {archived} partition(s)"))
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from core.models import CustomUser, DailyUserStats, FitnessActivity, GlucoseReading
+from core.services.daily_stats import local_day, refresh_daily_stats
+
+
+def data_bounds(user_id):
+    """First and last local day with an activity or reading for the user, or None if there are none."""
+    activities = FitnessActivity.objects.filter(user_id=user_id).aggregate(first=Min("start_time"), last=Max("start_time"))
+    readings = GlucoseReading.objects.filter(user_id=user_id).aggregate(first=Min("timestamp"), last=Max("timestamp"))
+    firsts = [value for value in (activities["first"], readings["first"]) if value]
+    lasts = [value for value in (activities["last"], readings["last"]) if value]
+    if not firsts:
+        return None
+    return local_day(min(firsts)), local_day(max(lasts))
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyUserStats from FitnessActivity and GlucoseReading."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Rebuild one user instead of everyone')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('id').values_list('id', flat=True)
+        if options['user_id']:
+            users = users.filter(id=options['user_id'])
+
+        started = time.perf_counter()
+        rebuilt = 0
+        for user_id in users.iterator():
+            bounds = data_bounds(user_id)
+            with transaction.atomic():
+                if bounds is None:
+                    DailyUserStats.objects.filter(user_id=user_id).delete()
+                    continue
+                first_day, last_day = bounds
+                DailyUserStats.objects.filter(user_id=user_id).exclude(date__range=bounds).delete()
+                refresh_daily_stats(user_id, first_day, last_day)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt daily stats for {rebuilt} user(s) in {time.perf_counter() - started:.1f}s"
+        ))
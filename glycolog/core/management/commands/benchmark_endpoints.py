@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+from core.models import CustomUser
+from core.services.llm_gateway import cache_stats
+
+# name -> (method, path, JSON body); each request to the chat endpoints adds a message to the user's chat
+ENDPOINTS = {
+    "dashboard": ("GET", "/api/dashboard/summary/", None),
+    "insights": ("GET", "/api/insights/summary/", None),
+    "trends": ("GET", "/api/health/trends/weekly/?refresh=true", None),
+    "chat": ("POST", "/api/dashboard/chat/", {"message": "How should I plan my exercise this week?"}),
+    "chat-stream": ("POST", "/api/dashboard/chat/stream/", {"message": "What should I eat before a run?"}),
+}
+ASYNC_ENDPOINTS = {"chat-stream"}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency of the LLM-backed endpoints as one user. Run with LLM_BACKEND=stub (and "
+        "run_llm_stub) or LLM_BACKEND=replay to get realistic model latencies without the network."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, required=True, help='User the requests authenticate as; chat requests add to their history')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight at once')
+        parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+        parser.add_argument('--base-url', help='Benchmark a running server instead of the app in-process')
+        parser.add_argument('--allow-network', action='store_true', help='Allow LLM_BACKEND=openai or record, which call OpenAI')
+
+    def handle(self, *args, **options):
+        if settings.LLM_BACKEND in ("openai", "record") and not options['allow_network']:
+            raise CommandError(f"LLM_BACKEND={settings.LLM_BACKEND} calls OpenAI; use stub or replay, or pass --allow-network")
+        if settings.LLM_BACKEND == "stub" and not options['base_url']:
+            try:
+                httpx.get(f"{settings.LLM_STUB_URL}/models", timeout=2).raise_for_status()
+            except httpx.HTTPError:
+                raise CommandError(f"No LLM stub answering at {settings.LLM_STUB_URL}; start it with manage.py run_llm_stub")
+
+        user = CustomUser.objects.filter(id=options['user_id']).first()
+        if user is None:
+            raise CommandError(f"User {options['user_id']} does not exist")
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        self.base_url = options['base_url']
+        self.local = threading.local()
+
+        self.stdout.write(f"🧪 LLM backend: {settings.LLM_BACKEND}, {'server ' + self.base_url if self.base_url else 'in-process'}, "
+                          f"{options['requests']} request(s) per endpoint, concurrency {options['concurrency']}")
+        before = cache_stats()
+        self.stdout.write(f"{'endpoint':<12} {'ok':>4} {'errors':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+
+        for name in options['endpoints']:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(lambda _: self.timed_request(name), range(options['requests'])))
+            timings = sorted(seconds for ok, seconds in results if ok)
+            errors = len(results) - len(timings)
+            if not timings:
+                self.stdout.write(self.style.ERROR(f"{name:<12} {0:>4} {errors:>6}   every request failed"))
+                continue
+            row = [sum(timings) / len(timings), percentile(timings, 0.5), percentile(timings, 0.95), percentile(timings, 0.99), timings[-1]]
+            self.stdout.write(f"{name:<12} {len(timings):>4} {errors:>6} " + " ".join(f"{seconds * 1000:>6.0f}ms" for seconds in row))
+
+        # In-process runs share this process's response cache; a server's is only visible here through Redis
+        after = cache_stats()
+        hits, misses = after['hits'] - before['hits'], after['misses'] - before['misses']
+        self.stdout.write(f"🗄️ LLM cache ({after['backend']}): {hits} hit(s), {misses} miss(es), "
+                          f"{after['saved_seconds'] - before['saved_seconds']:.1f}s of model time saved")
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark complete"))
+
+    def timed_request(self, name):
+        method, path, body = ENDPOINTS[name]
+        started = time.perf_counter()
+        try:
+            if name in ASYNC_ENDPOINTS and not self.base_url:
+                status = asyncio.run(self.asgi_request(method, path, body))
+            else:
+                response = self.client().request(method, path, json=body, headers=self.headers)
+                status = response.status_code
+        except Exception as e:
+            # In-process the view's own exceptions surface here; they count as failed requests
+            self.stderr.write(f"❌ {name}: {e!r}")
+            return False, time.perf_counter() - started
+        return status < 400, time.perf_counter() - started
+
+    def client(self):
+        # One client per worker thread; in-process, sync views go through the WSGI handler as under gunicorn
+        if not hasattr(self.local, "client"):
+            if self.base_url:
+                self.local.client = httpx.Client(base_url=self.base_url, timeout=120)
+            else:
+                self.local.client = httpx.Client(transport=httpx.WSGITransport(app=WSGIHandler()), base_url="http://testserver", timeout=120)
+        return self.local.client
+
+    async def asgi_request(self, method, path, body):
+        # The streaming view is async and only runs as intended under the ASGI handler
+        transport = httpx.ASGITransport(app=ASGIHandler())
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=120) as client:
+            response = await client.request(method, path, json=body, headers=self.headers)
+        return response.status_code
@@ -0,0 +1,78 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from core.prediction.forecasters import FORECASTERS
+
+
+def synthetic_glucose(rng, points, days=90):
+    """
+    CGM-like readings over `days`: a daily cycle with meal peaks, a weekend shift,
+    a slow drift and noise, at irregular times as real logs are.
+    """
+    end = pd.Timestamp("2025-01-01")
+    offsets = np.sort(rng.uniform(0, days * 86400, size=points))
+    ds = end - pd.Timedelta(days=days) + pd.to_timedelta(offsets, unit="s")
+    hours = ds.hour + ds.minute / 60
+
+    meals = sum(40 * np.exp(-((hours - h) ** 2) / 2) for h in (8, 13, 19))
+    weekend = np.where(ds.dayofweek >= 5, 12, 0)
+    drift = 10 * offsets / (days * 86400)
+    y = 110 + meals + weekend + drift + rng.normal(0, 12, size=points)
+    return pd.DataFrame({"ds": ds, "y": y})
+
+
+class Command(BaseCommand):
+    help = "Benchmark glucose forecaster backends for accuracy and fit/predict latency on seeded data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, nargs='+', default=[200, 1_000, 5_000],
+                            help='Readings per synthetic user over 90 days')
+        parser.add_argument('--users', type=int, default=5, help='Synthetic users per size')
+        parser.add_argument('--horizon', type=int, default=6, help='Forecast steps, 2 hours apart as in predict_glucose')
+        parser.add_argument('--backends', nargs='+', choices=list(FORECASTERS), default=list(FORECASTERS))
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # cmdstanpy logs two lines per Prophet fit
+        logging.getLogger("cmdstanpy").disabled = True
+        rng = np.random.default_rng(options['seed'])
+        horizon_hours = 2 * options['horizon']
+
+        for points in options['points']:
+            results = {name: {"fit": [], "predict": [], "mae": [], "coverage": []} for name in options['backends']}
+
+            for _ in range(options['users']):
+                df = synthetic_glucose(rng, points)
+                # Hold out the final horizon and score the forecast at the held-out readings
+                cutoff = df["ds"].max() - pd.Timedelta(hours=horizon_hours)
+                train, test = df[df["ds"] <= cutoff], df[df["ds"] > cutoff]
+                if test.empty:
+                    continue
+
+                for name in options['backends']:
+                    started = time.perf_counter()
+                    model = FORECASTERS[name]().fit(train)
+                    results[name]["fit"].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    forecast = model.predict(test["ds"].tolist())
+                    results[name]["predict"].append(time.perf_counter() - started)
+
+                    actual = test["y"].to_numpy()
+                    results[name]["mae"].append(np.mean(np.abs(forecast["yhat"].to_numpy() - actual)))
+                    results[name]["coverage"].append(np.mean(
+                        (actual >= forecast["yhat_lower"].to_numpy()) & (actual <= forecast["yhat_upper"].to_numpy())
+                    ))
+
+            self.stdout.write(f"\n📊 {points} readings x {options['users']} users, {horizon_hours}h hold-out:")
+            for name, r in results.items():
+                if not r["fit"]:
+                    continue
+                self.stdout.write(
+                    f"   {name:<8} fit {np.mean(r['fit']) * 1000:9.1f} ms | predict {np.mean(r['predict']) * 1000:7.1f} ms | "
+                    f"MAE {np.mean(r['mae']):6.2f} mg/dL | 80% interval coverage {np.mean(r['coverage']):6.1%}"
+                )
+
+        self.stdout.write(self.style.SUCCESS("\n✅ Forecaster benchmark complete"))
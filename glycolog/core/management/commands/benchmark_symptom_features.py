@@ -0,0 +1,58 @@
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from core.ml_utils import AVG_GLUCOSE_WINDOW, prior_cumulative_sum, trailing_window_mean
+
+
+def per_session_features(log_ns, log_values, session_ns, skipped, window_ns):
+    # Mirrors the old per-session loop: one 3-day scan and one rescan of earlier sessions each
+    avg_glucose, total_skipped = [], []
+    for t in session_ns:
+        in_window = (log_ns >= t - window_ns) & (log_ns <= t)
+        avg_glucose.append(log_values[in_window].mean() if in_window.any() else np.nan)
+        total_skipped.append(skipped[session_ns < t].sum())
+    return np.array(avg_glucose), np.array(total_skipped)
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorised avg_glucose_3d / total_skipped_meals features against a per-session loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                            help='Glucose logs per user to benchmark')
+        parser.add_argument('--sessions', type=int, default=365, help='Questionnaire sessions per user')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        window_ns = pd.Timedelta(AVG_GLUCOSE_WINDOW).value
+        minute_ns = pd.Timedelta(minutes=1).value
+
+        for size in options['sizes']:
+            # CGM-like spacing of 5-20 minutes between readings
+            log_ns = np.cumsum(rng.integers(5, 20, size=size)) * minute_ns
+            log_values = rng.uniform(60, 250, size=size)
+            session_ns = np.sort(rng.integers(log_ns[0], log_ns[-1], size=options['sessions']))
+            skipped = rng.integers(0, 3, size=options['sessions'])
+
+            start = time.perf_counter()
+            fast_avg = trailing_window_mean(log_ns, log_values, session_ns, window_ns)
+            fast_skipped = prior_cumulative_sum(session_ns, skipped, session_ns)
+            fast = time.perf_counter() - start
+
+            start = time.perf_counter()
+            slow_avg, slow_skipped = per_session_features(log_ns, log_values, session_ns, skipped, window_ns)
+            slow = time.perf_counter() - start
+
+            max_diff = np.nanmax(np.abs(fast_avg - slow_avg)) if np.isfinite(slow_avg).any() else 0.0
+            if not np.array_equal(fast_skipped, slow_skipped):
+                self.stdout.write(self.style.ERROR(f"❌ total_skipped_meals mismatch at {size} logs"))
+
+            self.stdout.write(
+                f"📊 {size:>7} logs / {options['sessions']} sessions: "
+                f"vectorised {fast * 1000:8.2f} ms | per-session {slow * 1000:9.2f} ms | "
+                f"speed-up {slow / fast if fast else float('inf'):7.1f}x | max avg diff {max_diff:.2e}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("✅ Feature benchmark complete"))
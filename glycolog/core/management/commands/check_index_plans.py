@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, connection
+from core.query_plans import force_index_plans, hot_queries, plan_problems
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the per-user, time-ordered hot queries and fail if any sorts or misses its composite index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, default=1, help='User the sample queries filter on')
+        parser.add_argument('--thread-id', type=int, default=1, help='Forum thread the comment query filters on')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only failing ones')
+
+    def handle(self, *args, **options):
+        queries = hot_queries(options['user_id'], options['thread_id'])
+        failures = []
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            force_index_plans(cursor)
+            for query in queries:
+                plan = query["queryset"].explain()
+                problems = plan_problems(cursor, query, plan)
+                if problems:
+                    failures.append(query["label"])
+                    self.stdout.write(self.style.ERROR(f"❌ {query['label']}: {', '.join(problems)}"))
+                else:
+                    self.stdout.write(f"✅ {query['label']}")
+                if problems or options['verbose_plans']:
+                    self.stdout.write("   " + plan.replace("\n", "\n   "))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} regressed: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"✅ All {len(queries)} hot queries use their indexes"))
@@ -0,0 +1,68 @@
+import logging
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.models import CustomUser
+from core.parallel import chunked, run_chunks
+from core.prediction.glucose_prediction import refresh_glucose_forecast, users_with_enough_data
+
+
+def forecast_user_chunk(user_ids, slots):
+    """
+    Forecasts a chunk of users inside a worker process, isolating failures per user.
+    """
+    logging.getLogger("cmdstanpy").disabled = True
+    results = []
+    for user_id in user_ids:
+        try:
+            stored = refresh_glucose_forecast(CustomUser.objects.get(id=user_id), slots)
+            results.append((user_id, "forecast" if stored else "insufficient", None))
+        except Exception as e:
+            results.append((user_id, "failed", f"{type(e).__name__}: {e}"))
+    return results
+
+
+class Command(BaseCommand):
+    help = "Precompute glucose forecasts for every user with enough recent readings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes (1 = run in this process)')
+        parser.add_argument('--chunk-size', type=int, default=20, help='Users handed to a worker at a time')
+        parser.add_argument('--slots', type=int, default=settings.GLUCOSE_FORECAST_SLOTS,
+                            help='Two-hour slots to forecast per user')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        all_ids = list(CustomUser.objects.order_by('id').values_list('id', flat=True))
+        user_ids = users_with_enough_data(all_ids)
+        self.stdout.write(
+            f"📈 Forecasting {len(user_ids)} of {len(all_ids)} users "
+            f"({len(all_ids) - len(user_ids)} skipped with too few readings)"
+        )
+
+        results = []
+        if options['workers'] > 1:
+            chunks = chunked(user_ids, options['chunk_size'])
+            for chunk, future in run_chunks(
+                "core.management.commands.forecast_all_users.forecast_user_chunk", chunks, options['workers'], options['slots']
+            ):
+                try:
+                    chunk_results = future.result()
+                except Exception as e:
+                    chunk_results = [(user_id, "failed", f"Worker crashed: {type(e).__name__}: {e}") for user_id in chunk]
+                results.extend(chunk_results)
+                self.stdout.write(f"📦 [{len(results)}/{len(user_ids)}] chunk finished")
+        else:
+            results = forecast_user_chunk(user_ids, options['slots'])
+
+        elapsed = time.monotonic() - started
+        outcomes = Counter(outcome for _, outcome, _ in results)
+        rate = len(user_ids) / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"\n🏁 {len(user_ids)} users in {elapsed:.1f}s ({rate:.1f} users/s) — forecast: {outcomes['forecast']}, "
+            f"not enough data: {outcomes['insufficient']}, failed: {outcomes['failed']}"
+        )
+        for user_id, _, error in results:
+            if error:
+                self.stdout.write(self.style.ERROR(f"   ❌ user {user_id}: {error}"))
@@ -0,0 +1,45 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core import model_registry
+from core.models import ModelArtifact
+
+# Files newer than this may belong to a publish whose index row is not committed yet
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = "Garbage-collect old model versions and, optionally, files no registry entry points to."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=settings.MODEL_REGISTRY_KEEP_VERSIONS,
+                            help='Versions to keep per user and model kind')
+        parser.add_argument('--orphans', action='store_true',
+                            help='Also scan the object store for unreferenced files and abandoned temp files')
+
+    def handle(self, *args, **options):
+        pairs = ModelArtifact.objects.values_list('user_id', 'kind').distinct()
+        removed = sum(model_registry.collect_garbage(user_id, kind, options['keep']) for user_id, kind in pairs)
+        self.stdout.write(f"🧹 Removed {removed} old model version(s)")
+
+        if options['orphans']:
+            self.stdout.write(f"🧹 Removed {self.remove_orphans()} orphaned file(s)")
+
+        self.stdout.write(self.style.SUCCESS("✅ Model registry clean-up complete"))
+
+    def remove_orphans(self):
+        objects_dir = os.path.join(settings.MODEL_REGISTRY_ROOT, "objects")
+        referenced = set(ModelArtifact.objects.values_list('sha256', flat=True))
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        removed = 0
+
+        for directory, _, files in os.walk(objects_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                sha256 = name.split(".")[0]
+                if name.startswith(".tmp-") or sha256 not in referenced:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+        return removed
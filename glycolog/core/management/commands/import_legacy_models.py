@@ -0,0 +1,51 @@
+import os
+import re
+import joblib
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.models import CustomUser
+from core.model_store import SYMPTOM_MODEL_KIND, save_symptom_model
+from core import model_registry
+
+LEGACY_MODEL = re.compile(r"^user_model_(\d+)\.pkl$")
+
+
+class Command(BaseCommand):
+    help = "Publish flat ml_models/user_model_{id}.pkl files from before the model registry as registry versions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Remove the legacy files once imported')
+
+    def handle(self, *args, **options):
+        root = settings.MODEL_REGISTRY_ROOT
+        imported = 0
+
+        for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            match = LEGACY_MODEL.match(name)
+            if not match:
+                continue
+            user_id = int(match.group(1))
+            model_path = os.path.join(root, name)
+            meta_path = os.path.join(root, f"user_model_{user_id}_meta.pkl")
+
+            if not CustomUser.objects.filter(id=user_id).exists():
+                self.stdout.write(f"⏭ user {user_id} no longer exists — skipping {name}")
+                continue
+            if model_registry.latest(user_id, SYMPTOM_MODEL_KIND):
+                self.stdout.write(f"⏭ user {user_id} already has a registry model — skipping {name}")
+                continue
+            if not os.path.exists(meta_path):
+                self.stdout.write(self.style.ERROR(f"❌ {name} has no meta file — skipping"))
+                continue
+
+            models = joblib.load(model_path)
+            mode = "per-symptom" if isinstance(models, dict) else "multilabel"
+            save_symptom_model(user_id, "legacy", models, joblib.load(meta_path), mode)
+            imported += 1
+            self.stdout.write(f"📥 Imported {name} for user {user_id}")
+
+            if options['delete']:
+                os.remove(model_path)
+                os.remove(meta_path)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Imported {imported} legacy model(s)"))
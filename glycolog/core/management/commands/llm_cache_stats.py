@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.services.llm_gateway import cache_stats, get_cache
+
+
+class Command(BaseCommand):
+    help = "Show the hit rate of the LLM response cache and the model time it has saved."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        hit_rate = f"{stats['hit_rate']:.1%}" if stats['hit_rate'] is not None else "n/a"
+
+        self.stdout.write(f"🗄️ Backend: {stats['backend']} ({stats['entries']} cached response(s))")
+        self.stdout.write(f"🎯 Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {hit_rate}")
+        self.stdout.write(f"⏱️ LLM time spent: {stats['llm_seconds']:.1f}s  Saved by the cache: {stats['saved_seconds']:.1f}s")
+
+        if options['reset']:
+            get_cache().reset()
+            self.stdout.write(self.style.SUCCESS("✅ Counters reset"))
@@ -0,0 +1,47 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from core import partitioning
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions of the time-series tables and freeze months that have gone cold."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.PARTITION_PREMAKE_MONTHS,
+                            help='Months of partitions to create after the current one')
+        parser.add_argument('--freeze', action='store_true',
+                            help='VACUUM (FREEZE, ANALYZE) the partition of the month before last, which no longer receives writes')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            self.stdout.write("⚠️ Partitioning needs PostgreSQL; nothing to do")
+            return
+
+        current = partitioning.month_start(date.today())
+        ahead = partitioning.add_months(current, options['months_ahead'])
+        # Health Connect can still sync last month's data, so only the month before it is cold
+        cold = partitioning.add_months(current, -2)
+
+        with connection.cursor() as cursor:
+            for table, column in partitioning.PARTITIONED_TABLES.items():
+                if not partitioning.is_partitioned(cursor, table):
+                    self.stdout.write(self.style.ERROR(f"❌ {table} is not partitioned; run migrate first"))
+                    continue
+
+                # Backdated or future-dated rows land in the default partition, which every query has to
+                # scan. They move out first: creating a partition for a month the default still holds
+                # rows for fails, so the months ahead could not be created either.
+                with transaction.atomic():
+                    rehomed = partitioning.rehome_default_rows(cursor, table, column)
+                    created = partitioning.ensure_partitions(cursor, table, current, ahead)
+                if rehomed:
+                    self.stdout.write(f"📦 {table}: moved rows out of the default partition into {', '.join(rehomed)}")
+                self.stdout.write(f"📅 {table}: created {len(created)} partition(s)" + (f" ({', '.join(created)})" if created else ""))
+
+                if options['freeze'] and partitioning.partition_name(table, cold) in partitioning.list_partitions(cursor, table):
+                    partitioning.freeze_partition(cursor, partitioning.partition_name(table, cold))
+                    self.stdout.write(f"🧊 {table}: froze {partitioning.partition_name(table, cold)}")
+
+        self.stdout.write(self.style.SUCCESS("✅ Partition maintenance complete"))
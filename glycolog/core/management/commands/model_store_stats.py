@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from core.models import ModelArtifact
+from core.model_store import SYMPTOM_MODEL_KIND
+
+
+class Command(BaseCommand):
+    help = "Report the on-disk and in-memory size of the stored per-user symptom models."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=5, help='Number of largest models to list')
+
+    def handle(self, *args, **options):
+        # The size metrics are stored with each published model, so one query covers every user
+        latest = ModelArtifact.objects.filter(kind=SYMPTOM_MODEL_KIND, is_latest=True).order_by('user_id')
+        sizes = [
+            (user_id, metadata["metrics"])
+            for user_id, metadata in latest.values_list('user_id', 'metadata')
+            if metadata.get("metrics")
+        ]
+
+        if not sizes:
+            self.stdout.write("ℹ️ No size metrics recorded yet — they are written when a model is trained.")
+            return
+
+        artifact_bytes = sum(m["artifact_bytes"] for _, m in sizes)
+        memory_bytes = sum(m["memory_bytes"] for _, m in sizes)
+        self.stdout.write(f"📦 {len(sizes)} user models")
+        self.stdout.write(f"   on disk:   {artifact_bytes / 1024 / 1024:9.2f} MiB (avg {artifact_bytes / len(sizes) / 1024:.0f} KiB)")
+        self.stdout.write(f"   in memory: {memory_bytes / 1024 / 1024:9.2f} MiB (avg {memory_bytes / len(sizes) / 1024:.0f} KiB)")
+        self.stdout.write(f"   trees: {sum(m['trees'] for _, m in sizes)}, nodes: {sum(m['nodes'] for _, m in sizes)}")
+
+        self.stdout.write(f"\n🏋️ Largest {options['top']} models:")
+        for user_id, m in sorted(sizes, key=lambda s: s[1]["artifact_bytes"], reverse=True)[:options['top']]:
+            self.stdout.write(f"   user {user_id}: {m['artifact_bytes'] / 1024:.0f} KiB, {m['trees']} trees, {m['nodes']} nodes")
+
+        self.stdout.write(self.style.SUCCESS("✅ Model store report complete"))
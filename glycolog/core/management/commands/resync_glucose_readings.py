@@ -0,0 +1,27 @@
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.services.glucose_readings import resync_readings
+
+
+class Command(BaseCommand):
+    help = (
+        "Resync GlucoseReading with GlucoseLog and GlucoseCheck after bulk updates or raw SQL "
+        "that bypassed the sync signals, then rebuild the daily stats built on it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Resync one user instead of everyone')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            upserted, removed = resync_readings(options['user_id'])
+        self.stdout.write(f"🩸 Upserted {upserted} reading(s), removed {removed} orphaned reading(s)")
+
+        # The batch upsert skips the GlucoseReading signals that keep DailyUserStats current
+        call_command('backfill_daily_stats', user_id=options['user_id'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Glucose readings resynced in {time.perf_counter() - started:.1f}s"
+        ))
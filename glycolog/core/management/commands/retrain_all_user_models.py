@@ -1,118 +1,240 @@
 from django.conf import settings
+from collections import Counter
+from io import BytesIO, StringIO
+import numpy as np
 import pandas as pd
-import joblib
-import os
-from django.db.models import Avg
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.multioutput import MultiOutputClassifier
+import time
 from django.core.management.base import BaseCommand
-from django.utils.timezone import now, timedelta
-from core.models import (
-    CustomUser, QuestionnaireSession, SymptomCheck, GlucoseCheck,
-    MealCheck, ExerciseCheck, GlucoseLog, PredictiveFeedback
+from django.utils.timezone import now
+from core.models import CustomUser, QuestionnaireSession, PredictiveFeedback
+from core.model_registry import read_watermark, write_watermark
+from core.model_cache import symptom_model_cache
+from core.model_store import dump_artifact, save_symptom_model
+from core.parallel import chunked, run_chunks
+from core.ml_utils import (
+    materialize_symptom_predictions, generate_trend_insights, backfill_session_features,
+    fit_symptom_models, load_training_rows, training_watermark, FEATURE_COLUMNS, SYMPTOMS
 )
-from core.ml_utils import explain_symptom_causes, generate_trend_insights, SYMPTOMS 
-
-def parse_symptoms(symptom_data):
-    if isinstance(symptom_data, dict):
-        return {k.lower(): v for k, v in symptom_data.items()}
-    elif isinstance(symptom_data, list):
-        return {
-            entry["symptom"].lower(): entry.get("severity", 1.0)
-            for entry in symptom_data if isinstance(entry, dict) and "symptom" in entry
-        }
-    return {}
+
+MODEL_MODES = ("per-symptom", "multilabel")
+
+def measure_layout(X, Y, mode, repeats=50):
+    """Fit time, pickled size and single-row predict latency of one training layout."""
+    started = time.perf_counter()
+    models = fit_symptom_models(X, Y, mode)
+    fit_seconds = time.perf_counter() - started
+
+    buffer = BytesIO()
+    dump_artifact(models, buffer)
+
+    row = X.iloc[[-1]]
+    estimators = [models] if mode == "multilabel" else list(models.values())
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for estimator in estimators:
+            estimator.predict_proba(row)
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        "fit_seconds": fit_seconds,
+        "size_bytes": buffer.getbuffer().nbytes,
+        "predict_ms": float(np.median(latencies)) * 1000,
+        "artifacts": len(estimators),
+    }
+
+
+def retrain_user_chunk(user_ids, model_version, force=False, mode="per-symptom"):
+    """
+    Retrains a chunk of users inside a worker process. Each user is isolated so a
+    failure is reported back instead of aborting the rest of the chunk.
+    """
+    results = []
+    for user_id in user_ids:
+        try:
+            user = CustomUser.objects.get(id=user_id)
+            outcome = Command(stdout=StringIO()).handle_single_user(user, model_version, force=force, mode=mode)
+            results.append((user_id, outcome, None))
+        except Exception as e:
+            results.append((user_id, "failed", f"{type(e).__name__}: {e}"))
+    return results
+
 
 class Command(BaseCommand):
     help = 'Train enhanced user models with trends and generate personalized predictive feedback.'
 
     def add_arguments(self, parser):
         parser.add_argument('--user_id', type=int, help='Specify a user ID to retrain model for a single user')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes (1 = run in this process)')
+        parser.add_argument('--chunk-size', type=int, default=10, help='Users handed to a worker at a time')
+        parser.add_argument('--force', action='store_true', help='Retrain even users whose data is unchanged since the last run')
+        parser.add_argument('--mode', choices=MODEL_MODES, default=settings.SYMPTOM_MODEL_MODE,
+                            help='One forest per symptom, or one multi-output forest per user')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Compare both training modes on each user\'s data without saving any models')
 
     def handle(self, *args, **options):
         model_version = f"v{now().strftime('%Y%m%d%H%M')}"
-        users = [CustomUser.objects.get(id=options['user_id'])] if options['user_id'] else CustomUser.objects.all()
+        mode = options['mode']
 
-        for user in users:
+        if options['benchmark']:
+            users = CustomUser.objects.order_by('id')
+            if options['user_id']:
+                users = users.filter(id=options['user_id'])
+            self.benchmark_modes(users)
+            return
+
+        if options['user_id']:
+            user = CustomUser.objects.get(id=options['user_id'])
             self.stdout.write(f"\n👤 Processing user: {user.username}")
-            self.handle_single_user(user, model_version)
+            self.handle_single_user(user, model_version, force=options['force'], mode=mode)
+            return
+
+        user_ids = list(CustomUser.objects.order_by('id').values_list('id', flat=True))
+        started = time.monotonic()
 
-    def handle_single_user(self, user, model_version):
-        sessions = QuestionnaireSession.objects.filter(user=user).prefetch_related(
-            'symptom_check', 'glucose_check', 'meal_check', 'exercise_check'
+        if options['workers'] > 1:
+            results = self.retrain_in_workers(
+                user_ids, model_version, options['workers'], options['chunk_size'], options['force'], mode
+            )
+        else:
+            results = []
+            for user in CustomUser.objects.order_by('id'):
+                self.stdout.write(f"\n👤 Processing user: {user.username}")
+                try:
+                    outcome = self.handle_single_user(user, model_version, force=options['force'], mode=mode)
+                    results.append((user.id, outcome, None))
+                except Exception as e:
+                    results.append((user.id, "failed", f"{type(e).__name__}: {e}"))
+                    self.stdout.write(self.style.ERROR(f"❌ Retraining failed for {user.username}: {results[-1][2]}"))
+
+        elapsed = time.monotonic() - started
+        outcomes = Counter(outcome for _, outcome, _ in results)
+        self.stdout.write(
+            f"\n🏁 {len(user_ids)} users in {elapsed:.1f}s — trained: {outcomes['trained']}, "
+            f"unchanged: {outcomes['unchanged']}, not enough data: {outcomes['insufficient']}, "
+            f"failed: {outcomes['failed']}"
         )
+        for user_id, _, error in results:
+            if error:
+                self.stdout.write(self.style.ERROR(f"   ❌ user {user_id}: {error}"))
 
-        data = []
-        for session in sessions:
-            symptom = session.symptom_check.first()
-            glucose = session.glucose_check.first()
-            meal = session.meal_check.first()
-            exercise = session.exercise_check.first()
+    def retrain_in_workers(self, user_ids, model_version, workers, chunk_size, force, mode):
+        all_results = []
+        chunks = chunked(user_ids, chunk_size)
+        self.stdout.write(f"⚙️ Retraining {len(user_ids)} users in {len(chunks)} chunks across {workers} workers")
 
-            if not all([symptom, glucose, meal, exercise]):
+        for chunk, future in run_chunks(
+            "core.management.commands.retrain_all_user_models.retrain_user_chunk", chunks, workers, model_version, force, mode
+        ):
+            try:
+                results = future.result()
+            except Exception as e:
+                # The worker itself died, so every user in its chunk is unaccounted for
+                results = [(user_id, "failed", f"Worker crashed: {type(e).__name__}: {e}") for user_id in chunk]
+
+            all_results.extend(results)
+            failed = sum(1 for _, outcome, _ in results if outcome == "failed")
+            self.stdout.write(
+                f"📦 [{len(all_results)}/{len(user_ids)}] chunk finished — {len(chunk) - failed} ok, {failed} failed"
+            )
+
+        return all_results
+
+    def benchmark_modes(self, users):
+        totals = {mode: Counter() for mode in MODEL_MODES}
+        benchmarked = 0
+
+        for user in users:
+            df = self.training_frame(user)
+            if len(df) < 10:
+                continue
+            X = df.drop(columns=SYMPTOMS)
+            Y = df[[s for s in SYMPTOMS if df[s].sum() > 0]]
+            if Y.empty:
                 continue
 
-            symptoms_dict = parse_symptoms(symptom.symptoms)
-            recent_glucose_logs = GlucoseLog.objects.filter(
-                user=user, timestamp__range=(session.created_at - timedelta(days=3), session.created_at))
-            avg_glucose = recent_glucose_logs.aggregate(avg=Avg('glucose_level')).get('avg') or 0
+            benchmarked += 1
+            line = [f"👤 {user.username} ({len(df)} rows, {Y.shape[1]} symptoms)"]
+            for mode in MODEL_MODES:
+                metrics = measure_layout(X, Y, mode)
+                totals[mode].update(metrics)
+                line.append(
+                    f"{mode}: fit {metrics['fit_seconds']:.2f}s, {metrics['size_bytes'] / 1024:.0f} KiB "
+                    f"in {metrics['artifacts']} model(s), predict {metrics['predict_ms']:.2f} ms"
+                )
+            self.stdout.write(" | ".join(line))
+
+        if not benchmarked:
+            self.stdout.write("ℹ️ No users with enough data to benchmark.")
+            return
 
-            past_sessions = sessions.filter(created_at__lt=session.created_at)
-            meals_skipped = sum(
-                len(ms.meal_check.first().skipped_meals)
-                for ms in past_sessions if ms.meal_check.exists()
+        self.stdout.write(f"\n📊 Totals over {benchmarked} users:")
+        for mode in MODEL_MODES:
+            t = totals[mode]
+            self.stdout.write(
+                f"   {mode:<12} fit {t['fit_seconds']:7.2f}s | {t['size_bytes'] / 1024 / 1024:8.2f} MiB | "
+                f"{t['artifacts']:5} models | mean predict {t['predict_ms'] / benchmarked:6.2f} ms/user"
             )
+        per_symptom, multilabel = totals["per-symptom"], totals["multilabel"]
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ multilabel vs per-symptom — fit {per_symptom['fit_seconds'] / max(multilabel['fit_seconds'], 1e-9):.1f}x faster, "
+            f"{per_symptom['size_bytes'] / max(multilabel['size_bytes'], 1):.1f}x smaller, "
+            f"predict {per_symptom['predict_ms'] / max(multilabel['predict_ms'], 1e-9):.1f}x faster"
+        ))
+
+    def training_frame(self, user):
+        # Sessions completed before the feature store existed are filled in once here
+        backfilled = backfill_session_features(user)
+        if backfilled:
+            self.stdout.write(f"🧮 Stored features for {backfilled} new session(s)")
 
-            entry = {
-                "glucose_level": glucose.glucose_level,
-                "weighted_gi": meal.weighted_gi,
-                "skipped_meals": len(meal.skipped_meals),
-                "exercise_duration": exercise.exercise_duration,
-                "stress": int(symptom.stress or 0),
-                "avg_glucose_3d": avg_glucose,
-                "total_skipped_meals": meals_skipped,
-                "hour_of_day": session.created_at.hour,
-                "day_of_week": session.created_at.weekday(),
-            }
+        data = []
+        for features, symptoms in load_training_rows(user):
+            entry = {column: features[column] for column in FEATURE_COLUMNS}
             for sym in SYMPTOMS:
-                entry[sym] = int(sym.lower() in symptoms_dict)
+                entry[sym] = int(sym in symptoms)
             data.append(entry)
+        return pd.DataFrame(data, columns=FEATURE_COLUMNS + SYMPTOMS)
 
-        if len(data) < 10:
-            self.stdout.write(f"❌ Not enough data for {user.username} ({len(data)} entries) — skipping model training")
-            return
+    def handle_single_user(self, user, model_version, force=False, mode="per-symptom"):
+        watermark = training_watermark(user)
+        if not force and read_watermark(user.id, mode) == watermark:
+            self.stdout.write(f"⏭ No new data for {user.username} since the last training run — skipping")
+            return "unchanged"
+
+        sessions = QuestionnaireSession.objects.filter(user=user)
+        df = self.training_frame(user)
+
+        if len(df) < 10:
+            self.stdout.write(f"❌ Not enough data for {user.username} ({len(df)} entries) — skipping model training")
+            write_watermark(user.id, watermark, model_version, mode)
+            return "insufficient"
 
-        df = pd.DataFrame(data)
         X = df.drop(columns=SYMPTOMS)
         symptom_columns = [s for s in SYMPTOMS if df[s].sum() > 0]
         Y = df[symptom_columns]
 
-        symptom_models = {}
-        for symptom in symptom_columns:
-            clf = RandomForestClassifier(random_state=42)
-            clf.fit(X, Y[symptom])
-            symptom_models[symptom] = clf
-
-        # Ensure directory exists
-        os.makedirs("ml_models", exist_ok=True)
+        if Y.empty:
+            # Nothing to predict until a symptom is reported; the watermark stops weekly retries
+            self.stdout.write(f"❌ No symptoms reported by {user.username} — skipping model training")
+            write_watermark(user.id, watermark, model_version, mode)
+            return "insufficient"
 
-        # Clean up old model files
-        for fname in os.listdir("ml_models"):
-            if fname.startswith(f"user_model_{user.id}"):
-                os.remove(os.path.join("ml_models", fname))
+        symptom_models = fit_symptom_models(X, Y, mode)
 
-        # Save new models
-        model_path = f"ml_models/user_model_{user.id}.pkl"
-        joblib.dump(symptom_models, model_path)
+        # Publish as the latest version; older versions are garbage-collected by the registry
+        artifact, metrics = save_symptom_model(user.id, model_version, symptom_models, symptom_columns, mode)
+        symptom_model_cache.invalidate(user.id)
 
-        meta_path = f"ml_models/user_model_{user.id}_meta.pkl"
-        joblib.dump(symptom_columns, meta_path)
-
-
-        self.stdout.write(f"✅ Per-symptom models saved to {model_path}")
+        self.stdout.write(
+            f"✅ {'Multilabel model' if mode == 'multilabel' else 'Per-symptom models'} saved as {artifact.version} "
+            f"[{artifact.sha256[:12]}] "
+            f"({metrics['artifact_bytes'] / 1024:.0f} KiB on disk, {metrics['trees']} trees, {metrics['nodes']} nodes)"
+        )
 
-        # Generate SHAP-based feedback
-        explanations = explain_symptom_causes(user, n_sessions=7, glucose_unit='mmol/L')
+        # Materialise the predictions served by /predictive-feedback/ and reuse them for SHAP feedback
+        explanations = materialize_symptom_predictions(user, model_version)
         shap_count = 0
         for result in explanations:
             if "model failed" in result.get("reason", "").lower():
@@ -133,7 +255,7 @@ class Command(BaseCommand):
         self.stdout.write(f"📈 Total SHAP insights saved: {shap_count}")
 
         # Generate trend insights
-        if len(data) >= 5:
+        if len(df) >= 5:
             trend_texts = generate_trend_insights(user, df, sessions)
             trend_count = 0
             for text in trend_texts:
@@ -154,3 +276,7 @@ class Command(BaseCommand):
             ))
         else:
             self.stdout.write("ℹ️ Skipping trend analysis due to insufficient data.")
+
+        # Written last so a run that fails part-way is retried next time
+        write_watermark(user.id, watermark, model_version, mode, metrics)
+        return "trained"
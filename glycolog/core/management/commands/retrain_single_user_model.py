@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from core.models import CustomUser
-from core.management.commands.retrain_all_user_models import Command as RetrainAll 
+from core.management.commands.retrain_all_user_models import MODEL_MODES, Command as RetrainAll 
+from django.conf import settings
 from django.utils.timezone import now
 
 class Command(BaseCommand):
@@ -8,9 +9,12 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--user_id", type=int, help="Optional user ID")
+        parser.add_argument("--force", action="store_true", help="Retrain even if the user's data is unchanged")
+        parser.add_argument("--mode", choices=MODEL_MODES, default=settings.SYMPTOM_MODEL_MODE,
+                            help="One forest per symptom, or one multi-output forest per user")
 
     def handle(self, *args, **options):
         user = CustomUser.objects.get(id=options["user_id"])
         retrainer = RetrainAll()
         model_version = f"v{now().strftime('%Y%m%d%H%M')}"
-        retrainer.handle_single_user(user, model_version)
+        retrainer.handle_single_user(user, model_version, force=options["force"], mode=options["mode"])
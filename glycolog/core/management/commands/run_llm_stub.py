@@ -0,0 +1,31 @@
+from urllib.parse import urlparse
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.services.llm_stub import make_stub_server
+
+
+class Command(BaseCommand):
+    help = "Serve a deterministic stand-in for the OpenAI chat API, used when LLM_BACKEND=stub."
+
+    def add_arguments(self, parser):
+        stub_url = urlparse(settings.LLM_STUB_URL)
+        parser.add_argument('--host', default=stub_url.hostname or '127.0.0.1')
+        parser.add_argument('--port', type=int, default=stub_url.port or 8765)
+        parser.add_argument('--latency-ms', type=int, default=500, help='Time to the first token of each reply')
+        parser.add_argument('--tokens-per-second', type=float, default=30.0, help='Rate the rest of the reply is produced at')
+        parser.add_argument('--tokens', type=int, default=120, help='Approximate length of each reply')
+
+    def handle(self, *args, **options):
+        server = make_stub_server(
+            options['host'], options['port'], options['latency_ms'] / 1000, options['tokens_per_second'], options['tokens'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"🤖 LLM stub on http://{options['host']}:{options['port']}/v1 "
+            f"({options['latency_ms']} ms to first token, {options['tokens_per_second']:g} tokens/s, ~{options['tokens']} tokens)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
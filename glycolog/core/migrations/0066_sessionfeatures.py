@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0065_delete_followupquestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feature_version', models.CharField(max_length=20)),
+                ('features', models.JSONField()),
+                ('symptoms', models.JSONField(default=list)),
+                ('session_created_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='features', to='core.questionnairesession')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_features', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sessionfeatures',
+            index=models.Index(fields=['user', 'feature_version', 'session_created_at'], name='core_sessio_user_id_ed4d87_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sessionfeatures',
+            unique_together={('session', 'feature_version')},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0066_sessionfeatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymptomPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(max_length=50)),
+                ('predictions', models.JSONField(default=list)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='symptom_prediction', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
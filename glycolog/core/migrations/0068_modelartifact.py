@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0067_symptomprediction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30)),
+                ('version', models.CharField(max_length=50)),
+                ('sha256', models.CharField(max_length=64)),
+                ('size_bytes', models.PositiveBigIntegerField()),
+                ('metadata', models.JSONField(default=dict)),
+                ('is_latest', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='model_artifacts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='modelartifact',
+            index=models.Index(fields=['user', 'kind', 'created_at'], name='core_modela_user_id_4f033d_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='modelartifact',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_latest', True)), fields=('user', 'kind'), name='unique_latest_model_artifact'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0068_modelartifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlucoseForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_start', models.DateTimeField()),
+                ('yhat', models.FloatField()),
+                ('yhat_lower', models.FloatField()),
+                ('yhat_upper', models.FloatField()),
+                ('forecaster', models.CharField(max_length=20)),
+                ('generated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='glucose_forecasts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'slot_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0069_glucoseforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlucoseReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('glucose_level', models.FloatField()),
+                ('source', models.CharField(choices=[('log', 'Glucose log'), ('check', 'Questionnaire glucose check')], max_length=10)),
+                ('source_id', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='glucose_readings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='glucosereading',
+            index=models.Index(fields=['user', 'timestamp'], name='core_glucos_user_id_dc12cf_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='glucosereading',
+            unique_together={('source', 'source_id')},
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_glucose_readings(apps, schema_editor):
+    GlucoseLog = apps.get_model("core", "GlucoseLog")
+    GlucoseCheck = apps.get_model("core", "GlucoseCheck")
+    GlucoseReading = apps.get_model("core", "GlucoseReading")
+
+    sources = [
+        ("log", GlucoseLog.objects.values_list("logID", "user_id", "timestamp", "glucose_level")),
+        ("check", GlucoseCheck.objects.values_list("id", "session__user_id", "timestamp", "glucose_level")),
+    ]
+    for source, rows in sources:
+        batch = []
+        for source_id, user_id, timestamp, glucose_level in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(GlucoseReading(
+                user_id=user_id, timestamp=timestamp, glucose_level=glucose_level,
+                source=source, source_id=source_id,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                GlucoseReading.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        GlucoseReading.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0070_glucosereading'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_glucose_readings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0071_backfill_glucose_readings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='glucoselog',
+            index=models.Index(fields=['user', 'timestamp', 'logID'], name='core_glucos_user_id_1f13f8_idx'),
+        ),
+    ]
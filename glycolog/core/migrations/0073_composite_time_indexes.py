@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0072_glucoselog_user_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airecommendation',
+            index=models.Index(fields=['user', 'generated_at'], name='core_aireco_user_id_285db3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['user', 'timestamp'], name='core_chatme_user_id_18e928_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'created_at'], name='core_commen_thread__86ee06_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessactivity',
+            index=models.Index(fields=['user', 'start_time'], name='core_fitnes_user_id_b84dc1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='glucosereading',
+            index=models.Index(fields=['user', 'timestamp'], include=('glucose_level',), name='glucose_reading_user_ts_cov'),
+        ),
+        migrations.RemoveIndex(
+            model_name='glucosereading',
+            name='core_glucos_user_id_dc12cf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='predictivefeedback',
+            index=models.Index(fields=['user', 'timestamp'], name='core_predic_user_id_6cd91c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionnairesession',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['user', 'created_at'], name='questionnaire_completed_idx'),
+        ),
+    ]
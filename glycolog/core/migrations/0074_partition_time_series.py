@@ -0,0 +1,91 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:44
+
+from datetime import date
+from django.conf import settings
+from django.db import migrations, models
+from core import partitioning
+
+# (table, partition key, primary key column). Pinned here rather than read from
+# partitioning.PARTITIONED_TABLES so this migration keeps doing what it did when written.
+TABLES = [
+    ("core_glucoselog", "timestamp", "logID"),
+    ("core_fitnessactivity", "start_time", "id"),
+]
+
+
+def partition_table(cursor, quote, table, column, pk):
+    legacy = f"{table}_unpartitioned"
+
+    # LIKE cannot copy indexes (the old primary key lacks the partition key) or foreign
+    # keys, so capture their definitions to replay on the partitioned table
+    cursor.execute(
+        "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+        [table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+    cursor.execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({quote(column)})"
+    )
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} DROP DEFAULT")
+
+    # Partitions for every month holding data through the months created ahead
+    cursor.execute(f"SELECT min({quote(column)}), max({quote(column)}), max({quote(pk)}) FROM {quote(legacy)}")
+    first, last, max_pk = cursor.fetchone()
+    current = partitioning.month_start(date.today())
+    ahead = partitioning.add_months(current, settings.PARTITION_PREMAKE_MONTHS)
+    first_month = partitioning.month_start(first) if first else current
+    last_month = max(partitioning.month_start(last), ahead) if last else ahead
+    partitioning.ensure_partitions(cursor, table, first_month, last_month)
+    partitioning.create_default_partition(cursor, table)
+
+    cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}")
+    cursor.execute(f"DROP TABLE {quote(legacy)}")
+
+    # The primary key of a partitioned table must include the partition key. Django keeps
+    # treating the id column alone as the primary key; the sequence keeps it unique.
+    cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(pk)}, {quote(column)})")
+    for definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+    sequence = f"{table}_{pk}_seq"
+    cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{quote(pk)}")
+    cursor.execute("SELECT setval(%s::regclass, %s, false)", [quote(sequence), (max_pk or 0) + 1])
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} SET DEFAULT nextval(%s::regclass)", [quote(sequence)])
+
+
+def partition_time_series(apps, schema_editor):
+    # Declarative partitioning is PostgreSQL-only; other engines keep plain tables
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column, pk in TABLES:
+            if not partitioning.is_partitioned(cursor, table):
+                partition_table(cursor, schema_editor.quote_name, table, column, pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0073_composite_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='airecommendation',
+            name='fitness_activities',
+            field=models.ManyToManyField(blank=True, db_constraint=False, to='core.fitnessactivity'),
+        ),
+        # Not reversed: the partitioned tables have the same columns and indexes, so earlier
+        # migrations still apply to them
+        migrations.RunPython(partition_time_series, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0074_partition_time_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('activity_count', models.IntegerField(default=0)),
+                ('steps', models.IntegerField(default=0)),
+                ('calories_burned', models.FloatField(default=0)),
+                ('distance_km', models.FloatField(default=0)),
+                ('heart_rate_sum', models.FloatField(default=0)),
+                ('heart_rate_count', models.IntegerField(default=0)),
+                ('sleep_hours_sum', models.FloatField(default=0)),
+                ('sleep_count', models.IntegerField(default=0)),
+                ('glucose_sum', models.FloatField(default=0)),
+                ('glucose_count', models.IntegerField(default=0)),
+                ('glucose_min', models.FloatField(blank=True, null=True)),
+                ('glucose_max', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0075_dailyuserstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airecommendation',
+            name='activity_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+BATCH_SIZE = 2000
+
+# Same rules as core.services.daily_stats, which uses the real models and can't run here
+VALID_ACTIVITY = Q(is_fallback=False) & ~Q(activity_type__iexact="sleep")
+
+
+def backfill_daily_stats(apps, schema_editor):
+    CustomUser = apps.get_model("core", "CustomUser")
+    FitnessActivity = apps.get_model("core", "FitnessActivity")
+    GlucoseReading = apps.get_model("core", "GlucoseReading")
+    DailyUserStats = apps.get_model("core", "DailyUserStats")
+
+    batch = []
+    for user_id in CustomUser.objects.order_by("id").values_list("id", flat=True).iterator(chunk_size=BATCH_SIZE):
+        days = {}
+        activities = (
+            FitnessActivity.objects
+            .filter(user_id=user_id)
+            .annotate(day=TruncDate("start_time"))
+            .values("day")
+            .annotate(
+                activity_count=Count("id", filter=VALID_ACTIVITY),
+                steps=Coalesce(Sum("steps", filter=VALID_ACTIVITY), 0),
+                calories_burned=Coalesce(Sum("calories_burned", filter=VALID_ACTIVITY), 0.0),
+                distance_km=Coalesce(Sum("distance_km", filter=VALID_ACTIVITY), 0.0),
+                heart_rate_sum=Coalesce(Sum("heart_rate", filter=VALID_ACTIVITY), 0.0),
+                heart_rate_count=Count("heart_rate", filter=VALID_ACTIVITY),
+                sleep_hours_sum=Coalesce(Sum("total_sleep_hours"), 0.0),
+                sleep_count=Count("total_sleep_hours"),
+            )
+            .order_by()
+        )
+        readings = (
+            GlucoseReading.objects
+            .filter(user_id=user_id)
+            .annotate(day=TruncDate("timestamp"))
+            .values("day")
+            .annotate(
+                glucose_sum=Sum("glucose_level"), glucose_count=Count("id"),
+                glucose_min=Min("glucose_level"), glucose_max=Max("glucose_level"),
+            )
+            .order_by()
+        )
+        for row in [*activities, *readings]:
+            days.setdefault(row.pop("day"), {}).update(row)
+
+        batch.extend(DailyUserStats(user_id=user_id, date=day, **stats) for day, stats in days.items())
+        if len(batch) >= BATCH_SIZE:
+            DailyUserStats.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    DailyUserStats.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0077_conversationmemory'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0078_backfill_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationmemory',
+            name='summarized_until_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
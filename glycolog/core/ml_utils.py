@@ -1,15 +1,16 @@
-from django.conf import settings
 from django.utils.timezone import now
-from core.models import ExerciseCheck, GlucoseLog, MealCheck, QuestionnaireSession
+from core.models import ExerciseCheck, GlucoseLog, MealCheck, QuestionnaireSession, SessionFeatures, SymptomPrediction
+from core.model_cache import symptom_model_cache
+from core.model_store import forest_params
 import pandas as pd
-import shap
-import joblib
-import os
-from django.db.models import Avg, Count
+from django.db.models import Count, Max, Q
 from datetime import timedelta
 from collections import defaultdict
 import numpy as np 
+from sklearn.ensemble import RandomForestClassifier
 import calendar
+import hashlib
+import json
 
 SYMPTOMS = [
     'Fatigue', 'Headaches', 'Dizziness', 'Thirst', 'Nausea', 'Blurred Vision',
@@ -30,6 +31,18 @@ EXPLANATION_LABELS = {
     "day_of_week": "day of the week"
 }
 
+# Feature columns of the symptom models, in training order
+FEATURE_COLUMNS = [
+    "glucose_level", "weighted_gi", "skipped_meals", "exercise_duration", "stress",
+    "avg_glucose_3d", "total_skipped_meals", "hour_of_day", "day_of_week"
+]
+
+# Number of recent sessions the materialised symptom predictions are explained over
+PREDICTION_SESSIONS = 10
+
+# Bump whenever the way features are computed changes so stored rows are rebuilt
+FEATURE_VERSION = "2"
+
 MODIFIABLE_FACTORS = {
     "glucose_level", "weighted_gi", "skipped_meals", "exercise_duration", "stress"
 }
@@ -50,6 +63,199 @@ def parse_symptoms(symptom_data):
         }
     return {}
 
+# Related objects prefetched whenever session features are computed in bulk
+SESSION_FEATURE_PREFETCH = (
+    "symptom_check", "glucose_check", "meal_check__high_gi_foods", "exercise_check"
+)
+
+AVG_GLUCOSE_WINDOW = timedelta(days=3)
+
+
+def _first_related(manager):
+    # Uses the prefetch cache when present, unlike .first() which always queries
+    return next(iter(manager.all()), None)
+
+
+def _to_ns(datetimes):
+    return pd.to_datetime(list(datetimes), utc=True).as_unit("ns").asi8
+
+
+def trailing_window_mean(event_ns, event_values, query_ns, window_ns):
+    """
+    Mean of the events in [query - window, query] for every query time.
+    event_ns must be sorted; queries with no events in their window are NaN.
+    """
+    means = np.full(len(query_ns), np.nan)
+    if not len(query_ns):
+        return means
+
+    hi = np.searchsorted(event_ns, query_ns, side="right")
+    lo = np.searchsorted(event_ns, query_ns - window_ns, side="left")
+    counts = hi - lo
+
+    # Each window is summed on its own rather than as a difference of one global cumsum,
+    # so a session's value is identical whichever other sessions share the batch
+    padded = np.append(np.asarray(event_values, dtype=np.float64), 0.0)
+    sums = np.add.reduceat(padded, np.column_stack((lo, hi)).ravel())[::2]
+    return np.divide(sums, counts, out=means, where=counts > 0)
+
+
+def prior_cumulative_sum(event_ns, event_values, query_ns):
+    """Sum of the events strictly before every query time. event_ns must be sorted."""
+    prefix = np.concatenate(([0], np.cumsum(event_values)))
+    return prefix[np.searchsorted(event_ns, query_ns, side="left")]
+
+
+def compute_session_features(user, sessions):
+    """
+    Computes symptom-model feature rows for a batch of sessions of one user.
+    Glucose logs and past meal checks are fetched once and the rolling features
+    are derived with sorted-array prefix sums, so training and SHAP explanations
+    always see identical values. Returns (session, features, symptoms) tuples in
+    session order; sessions missing a questionnaire step are left out.
+    """
+    complete = []
+    for session in sessions:
+        checks = [
+            _first_related(session.symptom_check), _first_related(session.glucose_check),
+            _first_related(session.meal_check), _first_related(session.exercise_check),
+        ]
+        if all(checks):
+            complete.append((session, *checks))
+
+    if not complete:
+        return []
+
+    complete.sort(key=lambda row: row[0].created_at)
+    session_ns = _to_ns(row[0].created_at for row in complete)
+    first_at = complete[0][0].created_at
+    last_at = complete[-1][0].created_at
+
+    logs = list(
+        GlucoseLog.objects.filter(user=user, timestamp__range=(first_at - AVG_GLUCOSE_WINDOW, last_at))
+        .order_by("timestamp")
+        .values_list("timestamp", "glucose_level")
+    )
+    log_ns = _to_ns(ts for ts, _ in logs)
+    log_values = np.fromiter((level for _, level in logs), dtype=np.float64, count=len(logs))
+    avg_glucose = trailing_window_mean(
+        log_ns, log_values, session_ns, pd.Timedelta(AVG_GLUCOSE_WINDOW).value
+    )
+
+    # Only the first meal check of each earlier session counts towards past skipped meals
+    skipped_by_session = {}
+    for session_id, created_at, skipped in (
+        MealCheck.objects.filter(session__user=user, session__created_at__lt=last_at)
+        .order_by("session__created_at", "id")
+        .values_list("session_id", "session__created_at", "skipped_meals")
+    ):
+        skipped_by_session.setdefault(session_id, (created_at, len(skipped or [])))
+    past = list(skipped_by_session.values())
+    total_skipped = prior_cumulative_sum(
+        _to_ns(created_at for created_at, _ in past),
+        np.fromiter((count for _, count in past), dtype=np.int64, count=len(past)),
+        session_ns,
+    )
+
+    rows = []
+    for i, (session, symptom, glucose, meal, exercise) in enumerate(complete):
+        created_at = session.created_at
+        features = {
+            "glucose_level": glucose.glucose_level,
+            "weighted_gi": meal.weighted_gi,
+            "skipped_meals": len(meal.skipped_meals),
+            "exercise_duration": exercise.exercise_duration,
+            "stress": int(symptom.stress or 0),
+            # Without logs in the window the session's own reading is the best estimate
+            "avg_glucose_3d": glucose.glucose_level if np.isnan(avg_glucose[i]) else float(avg_glucose[i]),
+            "total_skipped_meals": int(total_skipped[i]),
+            "hour_of_day": created_at.hour,
+            "day_of_week": created_at.weekday(),
+        }
+        reported = parse_symptoms(symptom.symptoms)
+        symptoms = [sym for sym in SYMPTOMS if sym.lower() in reported]
+        rows.append((session, features, symptoms))
+
+    return rows
+
+
+def _feature_row(session, features, symptoms):
+    return SessionFeatures(
+        user_id=session.user_id,
+        session=session,
+        feature_version=FEATURE_VERSION,
+        features=features,
+        symptoms=symptoms,
+        session_created_at=session.created_at,
+    )
+
+
+def store_session_features(session):
+    """
+    Persists the feature row for a completed session. Rows are append-only:
+    an existing row for the current FEATURE_VERSION is never recomputed.
+    """
+    existing = SessionFeatures.objects.filter(session=session, feature_version=FEATURE_VERSION).first()
+    if existing:
+        return existing
+
+    rows = compute_session_features(session.user, [session])
+    if not rows:
+        return None
+
+    stored, _ = SessionFeatures.objects.get_or_create(
+        session=session,
+        feature_version=FEATURE_VERSION,
+        defaults={
+            "user": session.user,
+            "features": rows[0][1],
+            "symptoms": rows[0][2],
+            "session_created_at": session.created_at,
+        },
+    )
+    return stored
+
+
+def backfill_session_features(user):
+    """Stores feature rows for completed sessions that do not have one for the current version yet."""
+    missing = QuestionnaireSession.objects.filter(user=user, completed=True).exclude(
+        features__feature_version=FEATURE_VERSION
+    ).prefetch_related(*SESSION_FEATURE_PREFETCH)
+
+    rows = compute_session_features(user, missing)
+    SessionFeatures.objects.bulk_create(
+        [_feature_row(*row) for row in rows], ignore_conflicts=True
+    )
+    return len(rows)
+
+
+def load_training_rows(user):
+    """Reads the stored feature rows of a user in session order with a single query."""
+    return list(
+        SessionFeatures.objects.filter(user=user, feature_version=FEATURE_VERSION)
+        .order_by("session_created_at")
+        .values_list("features", "symptoms")
+    )
+
+def training_watermark(user):
+    """
+    Fingerprint of every input the symptom models are trained on. If it matches the
+    watermark stored with the last model, retraining would reproduce the same model.
+    """
+    sessions = QuestionnaireSession.objects.filter(user=user).aggregate(
+        count=Count("id"), max_id=Max("id"), completed=Count("id", filter=Q(completed=True))
+    )
+    logs = GlucoseLog.objects.filter(user=user).aggregate(
+        count=Count("logID"), max_id=Max("logID"), latest=Max("timestamp")
+    )
+    parts = [
+        FEATURE_VERSION,
+        sessions["count"], sessions["max_id"], sessions["completed"],
+        logs["count"], logs["max_id"], logs["latest"].isoformat() if logs["latest"] else None,
+    ]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+
 def convert_glucose(val, unit):
     return val / 18.0 if unit == 'mmol/L' else val
 
@@ -117,64 +323,38 @@ def explain_symptom_causes(user, n_sessions=30):
     import logging
     logging.basicConfig(level=logging.DEBUG)
 
-    model_path = os.path.join(settings.BASE_DIR, "ml_models", f"user_model_{user.id}.pkl")
-    meta_path = os.path.join(settings.BASE_DIR, "ml_models", f"user_model_{user.id}_meta.pkl")
-
-    if not os.path.exists(model_path) or not os.path.exists(meta_path):
-        logging.warning(f"🚫 Model or meta file not found for user {user.id}")
-        return []
-
     try:
-        models = joblib.load(model_path)  # symptom -> classifier
-        trained_symptoms = joblib.load(meta_path)
+        cached = symptom_model_cache.get(user.id)
+        if cached is None:
+            logging.warning(f"🚫 No trained model found for user {user.id}")
+            return []
+
+        trained_symptoms = cached.trained_symptoms
         logging.debug(f"🧠 Trained symptoms: {trained_symptoms}")
 
-        sessions = QuestionnaireSession.objects.filter(user=user, completed=True).order_by("-created_at")[:n_sessions]
+        sessions = QuestionnaireSession.objects.filter(user=user, completed=True).order_by(
+            "-created_at"
+        ).prefetch_related(*SESSION_FEATURE_PREFETCH)[:n_sessions]
         logging.debug(f"📊 Found {len(sessions)} sessions")
 
         if not sessions:
             return [{"symptom": "No data", "reason": "Not enough recent symptom logs to analyze."}]
 
         symptom_data = defaultdict(list)
+        symptom_sessions = defaultdict(list)
         all_dates = defaultdict(list)
 
-        for session in sessions:
-            symptom = session.symptom_check.first()
-            glucose = session.glucose_check.first()
-            meal = session.meal_check.first()
-            exercise = session.exercise_check.first()
-
-            if not all([symptom, glucose, meal, exercise]):
-                logging.debug(f"⚠️ Skipping incomplete session {session.id}")
-                continue
-
-            reported_symptoms = parse_symptoms(symptom.symptoms)
+        # Same feature computation as training so SHAP values line up with the model inputs
+        for session, features, reported_symptoms in compute_session_features(user, sessions):
             if not reported_symptoms:
                 logging.debug(f"⚠️ No symptoms found in session {session.id}")
                 continue
 
-            created_at = session.created_at
-            start_time = created_at - timedelta(days=3)
-            avg_glucose = GlucoseLog.objects.filter(
-                user=user, timestamp__range=(start_time, created_at)
-            ).aggregate(avg=Avg("glucose_level"))["avg"] or glucose.glucose_level
-
-            features = {
-                "glucose_level": glucose.glucose_level,
-                "weighted_gi": meal.weighted_gi,
-                "skipped_meals": len(meal.skipped_meals),
-                "exercise_duration": exercise.exercise_duration,
-                "stress": int(symptom.stress or 0),
-                "avg_glucose_3d": avg_glucose,
-                "total_skipped_meals": 0,
-                "hour_of_day": created_at.hour,
-                "day_of_week": created_at.weekday(),
-            }
-
             for sym in trained_symptoms:
-                if sym.lower() in reported_symptoms:
+                if sym in reported_symptoms:
                     symptom_data[sym].append(features)
-                    all_dates[sym].append(created_at.date())
+                    symptom_sessions[sym].append(session.id)
+                    all_dates[sym].append(session.created_at.date())
 
         # Check which symptoms were reported in the last 3 sessions
         recent_sessions = sessions[:3]
@@ -199,28 +379,24 @@ def explain_symptom_causes(user, n_sessions=30):
                 continue
 
             X_df = pd.DataFrame(feature_list)
-            model = models.get(symptom_name)
-            if not model:
+            if not cached.has_model(symptom_name):
                 logging.warning(f"⚠️ No model found for {symptom_name}")
                 continue
 
-            explainer = shap.TreeExplainer(model)
-            shap_vals = explainer.shap_values(X_df)
+            # Rankings are memoised per model version, so repeat requests skip the tree traversal. The
+            # key covers the feature values themselves, since a backdated log changes a session's features
+            features_digest = hashlib.sha1(json.dumps(feature_list, sort_keys=True, default=str).encode()).hexdigest()
+            ranking_key = (FEATURE_VERSION, symptom_name, tuple(symptom_sessions[symptom_name]), features_digest)
+            avg_shap = cached.get_shap_ranking(ranking_key)
+            if avg_shap is None:
+                shap_matrix = cached.shap_matrix(symptom_name, X_df)
 
-            if isinstance(shap_vals, list):
-                shap_matrix = shap_vals[1] if len(shap_vals) > 1 else shap_vals[0]
-            elif shap_vals.ndim == 3 and shap_vals.shape[2] == 2:
-                shap_matrix = shap_vals[:, :, 1]
-            elif shap_vals.ndim == 3 and shap_vals.shape[0] == 2 and shap_vals.shape[1] == len(X_df):
-                shap_matrix = shap_vals[1]
-            else:
-                shap_matrix = shap_vals
+                if shap_matrix.shape != X_df.shape:
+                    logging.error(f"❌ SHAP matrix mismatch for {symptom_name}: {shap_matrix.shape} vs {X_df.shape}")
+                    continue
 
-            if shap_matrix.shape != X_df.shape:
-                logging.error(f"❌ SHAP matrix mismatch for {symptom_name}: {shap_matrix.shape} vs {X_df.shape}")
-                continue
-
-            avg_shap = pd.DataFrame(abs(shap_matrix), columns=X_df.columns).mean().sort_values(ascending=False)
+                avg_shap = pd.DataFrame(abs(shap_matrix), columns=X_df.columns).mean().sort_values(ascending=False)
+                cached.set_shap_ranking(ranking_key, avg_shap)
 
             explanations = []
             for feature in avg_shap.head(3).index:
@@ -263,6 +439,44 @@ def explain_symptom_causes(user, n_sessions=30):
 
 
 
+def fit_symptom_models(X, Y, mode="per-symptom"):
+    """
+    Fits the symptom classifiers for one user. "per-symptom" returns a dict of one
+    forest per symptom column; "multilabel" returns a single natively multi-output
+    forest whose outputs follow the column order of Y. Forest size is bounded by the
+    number of rows so artifacts stay small. Y must have at least one symptom column.
+    """
+    if Y.shape[1] == 0:
+        raise ValueError("No symptom columns to fit; the user has never reported a symptom")
+    params = forest_params(len(X))
+    if mode == "multilabel":
+        # A single column is fitted as a 1-D target to keep sklearn from warning
+        return RandomForestClassifier(**params).fit(X, Y.iloc[:, 0] if Y.shape[1] == 1 else Y)
+
+    symptom_models = {}
+    for symptom in Y.columns:
+        clf = RandomForestClassifier(**params)
+        clf.fit(X, Y[symptom])
+        symptom_models[symptom] = clf
+    return symptom_models
+
+
+def materialize_symptom_predictions(user, model_version):
+    """
+    Runs the SHAP explanation for the user's current model and stores the result so
+    /predictive-feedback/ can serve it without touching the model. A failed run
+    keeps the previously stored predictions.
+    """
+    explanations = explain_symptom_causes(user, n_sessions=PREDICTION_SESSIONS)
+    if any("model failed" in result.get("reason", "").lower() for result in explanations):
+        return explanations
+
+    SymptomPrediction.objects.update_or_create(
+        user=user, defaults={"model_version": model_version, "predictions": explanations}
+    )
+    return explanations
+
+
 def generate_trend_insights(user, df, sessions):
     from core.models import PredictiveFeedback
 
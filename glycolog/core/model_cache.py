@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+import shap
+from django.conf import settings
+from core import model_registry
+from core.model_store import SYMPTOM_MODEL_KIND, model_nbytes
+
+# SHAP rankings memoised per loaded model, one per (symptom, session set)
+MAX_SHAP_RANKINGS = 64
+
+
+class CachedSymptomModel:
+    """
+    A user's deserialised symptom classifiers and the symptoms they were trained on,
+    plus the SHAP explainers built for them and memoised SHAP rankings. Everything here
+    belongs to one model version and is dropped with the entry when the model changes.
+
+    models is either a dict of one classifier per symptom or, for multilabel training,
+    a single multi-output forest whose outputs follow trained_symptoms.
+    """
+
+    def __init__(self, key, models, trained_symptoms, size_bytes):
+        self.key = key
+        self.models = models
+        self.trained_symptoms = trained_symptoms
+        self.size_bytes = size_bytes
+        self.multilabel = not isinstance(models, dict)
+        self.explainers = {}
+        self.shap_rankings = OrderedDict()
+
+    def has_model(self, symptom):
+        if self.multilabel:
+            return symptom in self.trained_symptoms
+        return symptom in self.models
+
+    def explainer(self, symptom):
+        # The multilabel forest is explained once for every symptom
+        key = None if self.multilabel else symptom
+        if key not in self.explainers:
+            self.explainers[key] = shap.TreeExplainer(self.models if self.multilabel else self.models[symptom])
+        return self.explainers[key]
+
+    def shap_matrix(self, symptom, X_df):
+        """SHAP values of the symptom's positive class, one row per row of X_df."""
+        shap_vals = self.explainer(symptom).shap_values(X_df)
+
+        if self.multilabel:
+            # Outputs are flattened as output * n_classes + class, scaled by 1 / n_outputs;
+            # the scale is the same for every feature so rankings are unaffected
+            output = self.trained_symptoms.index(symptom)
+            classes = self.models.classes_ if self.models.n_outputs_ > 1 else [self.models.classes_]
+            positive = list(classes[output]).index(1) if 1 in classes[output] else 0
+            n_classes = shap_vals.shape[2] // self.models.n_outputs_
+            return shap_vals[:, :, output * n_classes + positive]
+
+        if isinstance(shap_vals, list):
+            return shap_vals[1] if len(shap_vals) > 1 else shap_vals[0]
+        if shap_vals.ndim == 3 and shap_vals.shape[2] == 2:
+            return shap_vals[:, :, 1]
+        if shap_vals.ndim == 3 and shap_vals.shape[0] == 2 and shap_vals.shape[1] == len(X_df):
+            return shap_vals[1]
+        return shap_vals
+
+    def get_shap_ranking(self, key):
+        ranking = self.shap_rankings.get(key)
+        if ranking is not None:
+            self.shap_rankings.move_to_end(key)
+        return ranking
+
+    def set_shap_ranking(self, key, ranking):
+        self.shap_rankings[key] = ranking
+        while len(self.shap_rankings) > MAX_SHAP_RANKINGS:
+            self.shap_rankings.popitem(last=False)
+
+
+class SymptomModelCache:
+    """
+    In-process LRU cache of loaded symptom models, keyed by user id and validated
+    against the content hash of the user's latest registry version on every lookup.
+    A retrain in any process publishes a new version, so the next lookup reloads.
+    Entry sizes are the in-memory size of the forests' tree arrays (artifacts on
+    disk are compressed); least recently used entries are evicted once max_bytes
+    is exceeded.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """The user's latest model, or None if they have never been trained."""
+        artifact = model_registry.latest(user_id, SYMPTOM_MODEL_KIND)
+        if artifact is None:
+            self.invalidate(user_id)
+            return None
+        key = artifact.sha256
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.key == key:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            if entry is not None:
+                self._remove(user_id)
+
+        bundle = model_registry.load(artifact)
+        entry = CachedSymptomModel(
+            key, bundle["models"], bundle["trained_symptoms"], model_nbytes(bundle["models"])
+        )
+
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+            self._entries[user_id] = entry
+            self.current_bytes += entry.size_bytes
+            # Always keep the entry just loaded, even if it alone exceeds the ceiling
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+        return entry
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id)
+        self.current_bytes -= entry.size_bytes
+
+
+symptom_model_cache = SymptomModelCache(settings.SYMPTOM_MODEL_CACHE_MAX_BYTES)
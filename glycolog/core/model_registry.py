@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import tempfile
+import joblib
+from django.conf import settings
+from django.db import transaction
+
+# Layout under settings.MODEL_REGISTRY_ROOT:
+#   objects/ab/cd/<sha256>.joblib   immutable, content-addressed model bundles
+#   records/<shard>/user_<id>.json  per-user training records (watermark, version, metrics)
+# Files are only ever created with a temp file + os.replace, so a reader sees either the
+# old file or the complete new one. The ModelArtifact table is the version index.
+
+RECORD_SHARDS = 256
+
+
+def object_path(sha256):
+    return os.path.join(settings.MODEL_REGISTRY_ROOT, "objects", sha256[:2], sha256[2:4], f"{sha256}.joblib")
+
+
+def record_path(user_id):
+    return os.path.join(
+        settings.MODEL_REGISTRY_ROOT, "records", f"{user_id % RECORD_SHARDS:02x}", f"user_{user_id}.json"
+    )
+
+
+def atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_record(user_id):
+    try:
+        with open(record_path(user_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_record(user_id, record):
+    atomic_write(record_path(user_id), json.dumps(record).encode())
+
+
+def read_watermark(user_id, mode="per-symptom"):
+    record = read_record(user_id)
+    # Switching training mode must retrain even if the data is unchanged
+    if record.get("mode", "per-symptom") != mode:
+        return None
+    return record.get("watermark")
+
+
+def read_model_version(user_id):
+    return read_record(user_id).get("model_version", "v1.0")
+
+
+def write_watermark(user_id, watermark, model_version, mode="per-symptom", metrics=None):
+    record = {"watermark": watermark, "model_version": model_version, "mode": mode}
+    if metrics:
+        record["metrics"] = metrics
+    write_record(user_id, record)
+
+
+def publish(user_id, kind, version, data, metadata=None):
+    """
+    Stores serialised model bytes under their content hash and makes them the user's
+    latest version of this kind. Identical bytes are only written once.
+    """
+    from core.models import CustomUser, ModelArtifact
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = object_path(sha256)
+    if not os.path.exists(path):
+        atomic_write(path, data)
+
+    with transaction.atomic():
+        # Serialises concurrent publishes for the same user so only one row stays latest
+        CustomUser.objects.select_for_update().filter(pk=user_id).exists()
+        ModelArtifact.objects.filter(user_id=user_id, kind=kind, is_latest=True).update(is_latest=False)
+        artifact = ModelArtifact.objects.create(
+            user_id=user_id, kind=kind, version=version, sha256=sha256,
+            size_bytes=len(data), metadata=metadata or {}, is_latest=True,
+        )
+
+    collect_garbage(user_id, kind)
+    return artifact
+
+
+def latest(user_id, kind):
+    from core.models import ModelArtifact
+    return ModelArtifact.objects.filter(user_id=user_id, kind=kind, is_latest=True).first()
+
+
+def load(artifact):
+    return joblib.load(object_path(artifact.sha256))
+
+
+def collect_garbage(user_id, kind, keep=None):
+    """
+    Drops all but the newest `keep` versions of a user's model and deletes their files
+    once no remaining version shares the content. The previous version is kept by
+    default so a reader that looked it up just before a publish can still load it.
+    """
+    from core.models import ModelArtifact
+
+    keep = settings.MODEL_REGISTRY_KEEP_VERSIONS if keep is None else keep
+    stale = list(
+        ModelArtifact.objects.filter(user_id=user_id, kind=kind, is_latest=False)
+        .order_by("-created_at", "-id")[max(keep - 1, 0):]
+    )
+    if not stale:
+        return 0
+
+    ModelArtifact.objects.filter(id__in=[a.id for a in stale]).delete()
+    still_used = set(
+        ModelArtifact.objects.filter(sha256__in={a.sha256 for a in stale}).values_list("sha256", flat=True)
+    )
+    for sha256 in {a.sha256 for a in stale} - still_used:
+        try:
+            os.remove(object_path(sha256))
+        except FileNotFoundError:
+            pass
+    return len(stale)
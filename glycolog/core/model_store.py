@@ -0,0 +1,69 @@
+import math
+from io import BytesIO
+import joblib
+from django.conf import settings
+from core import model_registry
+
+SYMPTOM_MODEL_KIND = "symptom"
+
+# Forest size bounds; small users get fewer, shallower trees than the sklearn defaults
+MIN_ESTIMATORS = 20
+MAX_ESTIMATORS = 100
+MIN_DEPTH = 3
+MAX_DEPTH = 12
+
+
+def forest_params(n_rows):
+    """
+    RandomForest settings scaled to the number of training rows. Unbounded trees on a
+    few dozen sessions mostly memorise noise and every extra level doubles the nodes
+    pickled, so depth grows with log2 of the rows and the tree count with the rows.
+    """
+    return {
+        "n_estimators": min(MAX_ESTIMATORS, max(MIN_ESTIMATORS, 2 * n_rows)),
+        "max_depth": min(MAX_DEPTH, max(MIN_DEPTH, math.ceil(math.log2(max(n_rows, 2))) + 1)),
+        "min_samples_leaf": 2,
+        "random_state": 42,
+    }
+
+
+def _estimators(models):
+    forests = models.values() if isinstance(models, dict) else [models]
+    return [tree for forest in forests for tree in forest.estimators_]
+
+
+def model_nbytes(models):
+    """In-memory size of the tree arrays, which dominate a loaded forest."""
+    total = 0
+    for tree in _estimators(models):
+        state = tree.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def dump_artifact(obj, target):
+    # target may be a path or a file object
+    joblib.dump(obj, target, compress=("zlib", settings.MODEL_STORE_COMPRESSION))
+
+
+def save_symptom_model(user_id, version, models, trained_symptoms, mode):
+    """
+    Publishes a user's compressed model bundle to the registry as their latest symptom
+    model and returns the registry entry with its size metrics.
+    """
+    buffer = BytesIO()
+    dump_artifact({"models": models, "trained_symptoms": trained_symptoms}, buffer)
+    data = buffer.getvalue()
+
+    trees = _estimators(models)
+    metrics = {
+        "artifact_bytes": len(data),
+        "memory_bytes": model_nbytes(models),
+        "trees": len(trees),
+        "nodes": sum(tree.tree_.node_count for tree in trees),
+    }
+    artifact = model_registry.publish(
+        user_id, SYMPTOM_MODEL_KIND, version, data,
+        {"mode": mode, "trained_symptoms": trained_symptoms, "metrics": metrics},
+    )
+    return artifact, metrics
@@ -60,6 +60,8 @@ class Meal(models.Model):
         return sum(item.carbs for item in self.food_items.all() if item.carbs is not None)
 
 # Model to log glucose levels for each user
+# Range-partitioned by month on timestamp under PostgreSQL (see core/partitioning.py), so
+# unique constraints must include timestamp and other tables cannot hold a database FK to it
 class GlucoseLog(models.Model):
     logID = models.AutoField(primary_key=True)  # Primary key for the log
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='glucose_logs')  # Foreign key linking to CustomUser
@@ -72,7 +74,10 @@ class GlucoseLog(models.Model):
     ])  # Context of glucose level logging    
     # meal = models.ForeignKey(Meal, on_delete=models.SET_NULL, null=True, blank=True)  # Add foreign key to Meal
     class Meta:
-        indexes = [models.Index(fields=['user']),]  # Index for faster lookups by user
+        indexes = [
+            models.Index(fields=['user']),  # Index for faster lookups by user
+            models.Index(fields=['user', 'timestamp', 'logID']),  # Keyset pagination of a user's history
+        ]
         constraints = [
             models.CheckConstraint(check=Q(glucose_level__gte=0), name='glucose_level_gte_0'),  # Constraint to ensure glucose level is non-negative
         ]
@@ -105,6 +110,13 @@ class QuestionnaireSession(models.Model):
     completed = models.BooleanField(default=False)  # Marks when the session is finished
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A user's completed sessions by date. Partial rather than (user, completed, created_at):
+            # Django filters booleans as a bare column, which SQLite cannot match to a key column.
+            models.Index(fields=["user", "created_at"], condition=models.Q(completed=True), name="questionnaire_completed_idx"),
+        ]
+
     def __str__(self):
         return f"QuestionnaireSession for {self.user.username} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
 
@@ -276,10 +288,29 @@ class ChatMessage(models.Model):
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "timestamp"]),  # Chat history, newest first
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.sender} - {self.timestamp}"
 
+# Model to store the rolling summary of a user's chat with the virtual coach
+class ConversationMemory(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name="conversation_memory")
+    summary = models.TextField(blank=True, default="")
+    # ChatMessages up to (summarized_until, summarized_until_id) are covered by the summary instead of
+    # being sent verbatim; the id breaks ties between messages with the same timestamp
+    summarized_until = models.DateTimeField(null=True, blank=True)
+    summarized_until_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - memory until {self.summarized_until}"
+
 # Model to store user activity data from Health Connect
+# Range-partitioned by month on start_time under PostgreSQL, like GlucoseLog
 class FitnessActivity(models.Model):
     ACTIVITY_SOURCES = [
         ("Smartwatch", "Smartwatch"),
@@ -316,6 +347,7 @@ class FitnessActivity(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["start_time"]),
+            models.Index(fields=["user", "start_time"]),  # A user's activities by time
         ]
         ordering = ["-start_time"]
 
@@ -353,18 +385,23 @@ class AIRecommendation(models.Model):
     generated_at = models.DateTimeField(auto_now_add=True)
     recommendation_text = models.TextField()  # AI-generated advice
 
-    fitness_activities = models.ManyToManyField(FitnessActivity, blank=True)
+    # No database FK: FitnessActivity is partitioned on PostgreSQL and its id alone is not a unique key there
+    fitness_activities = models.ManyToManyField(FitnessActivity, blank=True, db_constraint=False)
 
     # Health-Specific Context
     glucose_level = models.FloatField(null=True, blank=True)  # Latest glucose reading
     glucose_unit = models.CharField(max_length=10, default="mg/dL")  # mg/dL or mmol/L
     context_summary = models.TextField(blank=True, null=True)  # Explanation of AI’s reasoning
     ai_version = models.CharField(max_length=20, default="GPT-4")  # Track AI model version used
+    activity_fingerprint = models.CharField(max_length=64, blank=True, default="")  # Hash of the activities it was generated from
     
     health_trend = models.ForeignKey(AIHealthTrend, on_delete=models.SET_NULL, null=True, blank=True)
 
     class Meta:
         ordering = ["-generated_at"]
+        indexes = [
+            models.Index(fields=["user", "generated_at"]),  # Latest recommendations for a user
+        ]
 
     def __str__(self):
         return f"AI Recommendation for {self.user.username} - {self.generated_at.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -436,6 +473,11 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["thread", "created_at"]),  # A thread's comments in posting order
+        ]
+
     def __str__(self):
         return f"{self.author.username}: {self.content[:30]}"
     
@@ -529,5 +571,135 @@ class PredictiveFeedback(models.Model):
     ('improvement', 'Improvement'),
 ])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "timestamp"]),  # Latest feedback for a user
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+# Model to store the engineered symptom-model features of a completed questionnaire session
+class SessionFeatures(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="session_features")
+    session = models.ForeignKey(QuestionnaireSession, on_delete=models.CASCADE, related_name="features")
+    feature_version = models.CharField(max_length=20)  # Bumped whenever the feature definitions change
+    features = models.JSONField()  # Feature name -> value (see ml_utils.FEATURE_COLUMNS)
+    symptoms = models.JSONField(default=list)  # Symptom labels reported in the session
+    session_created_at = models.DateTimeField()  # Copied from the session so training can order without a join
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("session", "feature_version")  # Append-only: one row per session and version
+        indexes = [models.Index(fields=["user", "feature_version", "session_created_at"])]
+
+    def __str__(self):
+        return f"{self.user.username} - session {self.session_id} features ({self.feature_version})"
+
+
+# Model to store the latest SHAP-based symptom explanations, materialised when models are trained
+class SymptomPrediction(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name="symptom_prediction")
+    model_version = models.CharField(max_length=50)
+    predictions = models.JSONField(default=list)  # [{"symptom": ..., "reason": ...}] with glucose in mg/dL
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - predictions ({self.model_version})"
+
+
+# Model to index the versioned, content-addressed model artifacts written by core.model_registry
+class ModelArtifact(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="model_artifacts")
+    kind = models.CharField(max_length=30)  # e.g. "symptom"
+    version = models.CharField(max_length=50)
+    sha256 = models.CharField(max_length=64)  # Content hash; also names the file in the registry
+    size_bytes = models.PositiveBigIntegerField()
+    metadata = models.JSONField(default=dict)  # Training mode, symptoms, size metrics, ...
+    is_latest = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # At most one latest version per user and kind, so the lookup is a single index probe
+            models.UniqueConstraint(
+                fields=["user", "kind"], condition=models.Q(is_latest=True), name="unique_latest_model_artifact"
+            ),
+        ]
+        indexes = [models.Index(fields=["user", "kind", "created_at"])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.kind} model {self.version}"
+
+
+# Model to store precomputed glucose forecasts, one row per user and two-hour slot
+class GlucoseForecast(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="glucose_forecasts")
+    slot_start = models.DateTimeField()  # Time the forecast is for (the "ds" of the prediction)
+    yhat = models.FloatField()
+    yhat_lower = models.FloatField()
+    yhat_upper = models.FloatField()
+    forecaster = models.CharField(max_length=20)  # Backend that produced it (see settings.GLUCOSE_FORECASTER)
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "slot_start")  # Also serves the per-user lookup of upcoming slots
+
+    def __str__(self):
+        return f"{self.user.username} - forecast for {self.slot_start.strftime('%Y-%m-%d %H:%M')}"
+
+
+# Model to store every glucose reading from GlucoseLog and GlucoseCheck in one time series, kept in sync by signals
+class GlucoseReading(models.Model):
+    SOURCE_CHOICES = [
+        ("log", "Glucose log"),
+        ("check", "Questionnaire glucose check"),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="glucose_readings")
+    timestamp = models.DateTimeField()
+    glucose_level = models.FloatField()  # mg/dL, as stored on the source row
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    source_id = models.IntegerField()  # GlucoseLog.logID or GlucoseCheck.id
+
+    class Meta:
+        unique_together = ("source", "source_id")
+        indexes = [
+            # Latest, windowed and range reads are one index scan; on PostgreSQL the included
+            # glucose_level lets reading_stats and the timeline run as index-only scans
+            models.Index(fields=["user", "timestamp"], include=["glucose_level"], name="glucose_reading_user_ts_cov"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.glucose_level} at {self.timestamp.strftime('%d/%m/%Y %H:%M:%S')} ({self.source})"
+
+# Model to store one user's fitness and glucose totals for one local day, kept in sync by signals
+class DailyUserStats(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()  # Local date (TIME_ZONE) of the activities' start_time and the readings' timestamp
+
+    # Non-fallback, non-sleep activities, as counted by the health trends
+    activity_count = models.IntegerField(default=0)
+    steps = models.IntegerField(default=0)
+    calories_burned = models.FloatField(default=0)
+    distance_km = models.FloatField(default=0)
+    heart_rate_sum = models.FloatField(default=0)
+    heart_rate_count = models.IntegerField(default=0)
+
+    # Any activity reporting sleep, fallback records included
+    sleep_hours_sum = models.FloatField(default=0)
+    sleep_count = models.IntegerField(default=0)
+
+    # Every GlucoseReading
+    glucose_sum = models.FloatField(default=0)
+    glucose_count = models.IntegerField(default=0)
+    glucose_min = models.FloatField(null=True, blank=True)
+    glucose_max = models.FloatField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "date")  # Also serves the per-user date-range reads
+
     def __str__(self):
-        return f"{self.user.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.user.username} - {self.date}"
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Largest page a client may ask for with ?page_size=
+MAX_PAGE_SIZE = 500
+
+CURSOR_SALT = "core.pagination.keyset"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, pk):
+    # Signed so clients treat it as opaque and cannot forge positions
+    return signing.dumps([timestamp.isoformat(), pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    try:
+        timestamp, pk = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+    parsed = parse_datetime(timestamp) if isinstance(timestamp, str) else None
+    if parsed is None:
+        raise InvalidCursor("Invalid cursor")
+    return parsed, pk
+
+
+def page_size_from(request):
+    try:
+        size = int(request.query_params.get("page_size", settings.REST_FRAMEWORK["PAGE_SIZE"]))
+    except ValueError:
+        raise InvalidCursor("page_size must be an integer")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor, page_size, timestamp_field="timestamp", pk_field="pk"):
+    """
+    Newest-first page of queryset after the position in cursor, ordered by
+    (timestamp_field, pk_field) descending so ties on timestamp stay stable.
+    Returns (items, next_cursor) where next_cursor is None on the last page.
+    The position is a WHERE clause on the indexed columns, not an OFFSET, so
+    every page costs the same however deep it is.
+    """
+    queryset = queryset.order_by(f"-{timestamp_field}", f"-{pk_field}")
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{timestamp_field}__lt": timestamp})
+            | Q(**{timestamp_field: timestamp, f"{pk_field}__lt": pk})
+        )
+
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    last = items[-1]
+    return items, encode_cursor(getattr(last, timestamp_field), getattr(last, "pk"))
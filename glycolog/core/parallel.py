@@ -0,0 +1,51 @@
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Nothing Django-specific is imported at module level: under the spawn start method
+# (Windows/macOS) workers unpickle these helpers before Django has been set up.
+
+
+def chunked(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _init_worker():
+    import django
+    django.setup()  # A no-op for forked workers, required for spawned ones
+
+
+def _call(func_path, *args):
+    module_path, name = func_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_path), name)(*args)
+
+
+def _run_pool(func_path, chunks, workers, args):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_call, func_path, chunk, *args): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            yield futures[future], future
+
+
+def run_chunks(func_path, chunks, workers, *args):
+    """
+    Runs func_path(chunk, *args) for every chunk in a pool of worker processes and
+    yields (chunk, future) pairs as they finish. Each worker opens its own database
+    connection; the parent's connections are closed first so none are inherited.
+    """
+    from django.db import connections
+    connections.close_all()
+
+    unfinished = []
+    for chunk, future in _run_pool(func_path, chunks, workers, args):
+        if isinstance(future.exception(), BrokenProcessPool):
+            unfinished.append(chunk)
+        else:
+            yield chunk, future
+
+    # A worker that dies (OOM kill, segfault in native code) breaks the whole pool and every
+    # pending future with it. Rerun those chunks one at a time in a fresh pool each, so only
+    # the chunk that kills its worker again is reported as crashed.
+    for chunk in unfinished:
+        yield from _run_pool(func_path, [chunk], 1, args)
@@ -0,0 +1,169 @@
+from datetime import date, datetime, time, timedelta, timezone
+from django.db import connection
+from django.utils.timezone import make_aware
+
+# Monthly range partitioning of the time-series tables on PostgreSQL. Each table is
+# partitioned on its timestamp column into <table>_pYYYY_MM partitions of one UTC month,
+# plus a <table>_default partition that catches rows outside every month created so far.
+# Queries bounded on the timestamp only touch the partitions for the months they cover.
+
+# Table -> partition key column
+PARTITIONED_TABLES = {
+    "core_glucoselog": "timestamp",
+    "core_fitnessactivity": "start_time",
+}
+
+# Schema detached partitions are moved to by the retention policy
+ARCHIVE_SCHEMA = "archive"
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def month_of_partition(table, name):
+    """The month a partition created by create_partition covers, or None for any other name."""
+    try:
+        return datetime.strptime(name, f"{table}_p%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def day_range(first_day, last_day=None):
+    """
+    [start, end) datetimes covering first_day to last_day in the current time zone, the same
+    rows as a __date / __date__range lookup. Filter the partition key with these instead:
+    __date casts the column, so it can neither prune partitions nor use an index.
+    """
+    last_day = last_day or first_day
+    start = make_aware(datetime.combine(first_day, time.min))
+    end = make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND c.relnamespace = 'public'::regnamespace",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor, table):
+    """Names of the monthly partitions attached to table, oldest first. Excludes the default partition."""
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = %s AND parent.relnamespace = 'public'::regnamespace",
+        [table],
+    )
+    names = [row[0] for row in cursor.fetchall()]
+    return sorted(name for name in names if month_of_partition(table, name))
+
+
+def _bound(month):
+    # Dates are formatted here, never taken from input, so the literal is safe in DDL
+    return f"'{datetime(month.year, month.month, 1, tzinfo=timezone.utc).isoformat()}'"
+
+
+def create_partition(cursor, table, month):
+    """Create the partition for month if it does not exist yet. Returns True when it was created."""
+    name = partition_name(table, month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    cursor.execute(
+        f"CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {connection.ops.quote_name(table)} "
+        f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    )
+    return True
+
+
+def create_default_partition(cursor, table):
+    name = default_partition_name(table)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} "
+        f"PARTITION OF {connection.ops.quote_name(table)} DEFAULT"
+    )
+
+
+def ensure_partitions(cursor, table, first_month, last_month):
+    """Create every missing monthly partition from first_month to last_month inclusive. Returns the names created."""
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        if create_partition(cursor, table, month):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def rehome_default_rows(cursor, table, column):
+    """
+    Give every month with rows in the default partition its own partition and move the rows
+    there. Creating the partition directly would fail while the default holds rows in its range.
+    Run inside a transaction. Returns the names of the partitions created.
+    """
+    quote = connection.ops.quote_name
+    default = quote(default_partition_name(table))
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', {quote(column)} AT TIME ZONE 'UTC') FROM {default}")
+    months = sorted(month_start(row[0]) for row in cursor.fetchall())
+
+    created = []
+    for month in months:
+        holding = f"{table}_rehome"
+        cursor.execute(f"CREATE TEMPORARY TABLE {quote(holding)} (LIKE {quote(table)}) ON COMMIT DROP")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE {quote(column)} >= {_bound(month)} "
+            f"AND {quote(column)} < {_bound(add_months(month, 1))} RETURNING *) "
+            f"INSERT INTO {quote(holding)} SELECT * FROM moved"
+        )
+        create_partition(cursor, table, month)
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(holding)}")
+        cursor.execute(f"DROP TABLE {quote(holding)}")
+        created.append(partition_name(table, month))
+    return created
+
+
+def archive_partition(cursor, table, name):
+    """
+    Detach a partition and move it into the archive schema. The rows leave every query on
+    the live table but stay queryable as archive.<name> until someone drops them.
+    """
+    quoted = connection.ops.quote_name(name)
+    archived = f"{ARCHIVE_SCHEMA}.{quoted}"
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+    cursor.execute(f"ALTER TABLE {connection.ops.quote_name(table)} DETACH PARTITION {quoted}")
+    cursor.execute(f"ALTER TABLE {quoted} SET SCHEMA {ARCHIVE_SCHEMA}")
+
+    # The detached table keeps its copy of the user FK, which would block deleting those users
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [archived])
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {archived} DROP CONSTRAINT {connection.ops.quote_name(constraint)}")
+
+
+def freeze_partition(cursor, name):
+    """
+    VACUUM (FREEZE, ANALYZE) one partition. Run once a month has stopped receiving
+    writes, so anti-wraparound vacuums never need to rescan it. Must run outside a transaction.
+    """
+    cursor.execute(f"VACUUM (FREEZE, ANALYZE) {connection.ops.quote_name(name)}")
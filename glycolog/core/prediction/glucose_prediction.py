@@ -1,49 +1,194 @@
-from core.models import GlucoseLog, GlucoseCheck
-from datetime import datetime, timedelta
+from core.models import GlucoseForecast
+from core.services.glucose_readings import reading_counts, readings_in_range
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Sum
 from django.utils.timezone import now
-from prophet import Prophet
+from core.prediction.forecasters import get_forecaster
+import hashlib
+import logging
+import time
+import numpy as np
 import pandas as pd
 
+# Training window and minimum number of readings for a forecast
+HISTORY_DAYS = 90
+MIN_POINTS = 10
+
+# How long a concurrent request waits for another process's fit before fitting itself
+FIT_WAIT_SECONDS = 60
+FIT_POLL_SECONDS = 0.5
+
+logger = logging.getLogger(__name__)
+
 def fetch_user_glucose_data(user):
-    logs = GlucoseLog.objects.filter(user=user).values("timestamp", "glucose_level")
-    checks = GlucoseCheck.objects.filter(session__user=user).values("timestamp", "glucose_level")
+    """
+    The user's readings from the last HISTORY_DAYS as a ds/y frame (naive UTC), or None
+    if there are fewer than MIN_POINTS. Read from the combined GlucoseReading series with
+    a time-windowed scan of the (user, timestamp) index, projecting just two columns.
+    """
+    rows = readings_in_range(user, now() - timedelta(days=HISTORY_DAYS)).values_list("timestamp", "glucose_level")
+
+    timestamps, levels = [], []
+    for timestamp, level in rows.iterator():
+        timestamps.append(timestamp)
+        levels.append(level)
 
-    all_data = list(logs) + list(checks)
-    if not all_data:
+    if len(levels) < MIN_POINTS:
         return None
 
-    df = pd.DataFrame(all_data)
-    df = df.dropna()
-    df = df.rename(columns={"timestamp": "ds", "glucose_level": "y"})
+    return pd.DataFrame({
+        "ds": pd.to_datetime(timestamps, utc=True).tz_localize(None),
+        "y": np.asarray(levels, dtype=float),
+    })
+
+
+def users_with_enough_data(user_ids):
+    """
+    The subset of user_ids with at least MIN_POINTS readings in the training window,
+    found with one grouped COUNT instead of fetching anyone's readings.
+    """
+    counts = reading_counts(user_ids, now() - timedelta(days=HISTORY_DAYS))
+    return [user_id for user_id in user_ids if counts.get(user_id, 0) >= MIN_POINTS]
+
+
+def glucose_data_watermark(user):
+    """
+    Changes whenever the readings in the training window change: one is added, edited,
+    deleted or ages out. Only the window fetch_user_glucose_data trains on is read, through
+    the (user, timestamp) index, not the whole history.
+    """
+    readings = readings_in_range(user, now() - timedelta(days=HISTORY_DAYS)).order_by().aggregate(
+        count=Count("*"), latest=Max("timestamp"), total=Sum("glucose_level")
+    )
+    return hashlib.sha1("|".join(str(p) for p in readings.values()).encode()).hexdigest()[:16]
+
+
+def _cache_call(method, *args):
+    """cache.<method>(*args), or None when the cache backend is unreachable; forecasts then just refit."""
+    try:
+        return getattr(cache, method)(*args)
+    except Exception as e:
+        logger.warning("Glucose model cache %s failed: %s", method, e)
+        return None
+
+
+def _cached_model(forecaster, key):
+    serialized = _cache_call("get", key)
+    return forecaster.from_json(serialized) if serialized else None
+
+
+def get_fitted_model(user, watermark, forecaster=None):
+    """
+    Returns the user's forecaster fitted on the data described by watermark, or None
+    if there is not enough data. Fits are cached, and concurrent requests for the same
+    user share one fit through a lock held in the cache. Without a working cache every
+    request fits on its own.
+    """
+    forecaster = forecaster or get_forecaster()
+    key = f"glucose_{forecaster.name}:{user.id}:{watermark}"
+    model = _cached_model(forecaster, key)
+    if model is not None:
+        return model
 
-    df["ds"] = pd.to_datetime(df["ds"]).dt.tz_localize(None)
+    lock_key = f"{key}:fitting"
+    acquired = _cache_call("add", lock_key, True, FIT_WAIT_SECONDS)
+    if acquired is False:
+        # Another thread or process is fitting; wait until it stores the model or gives up the lock
+        deadline = time.monotonic() + FIT_WAIT_SECONDS
+        while time.monotonic() < deadline and _cache_call("get", lock_key):
+            time.sleep(FIT_POLL_SECONDS)
+        model = _cached_model(forecaster, key)
+        if model is not None:
+            return model
 
-    df = df.sort_values("ds")
-    df = df[df["ds"] > (now().replace(tzinfo=None) - pd.Timedelta(days=90))]
+    try:
+        df = fetch_user_glucose_data(user)
+        if df is None:
+            return None
 
-    return df if len(df) >= 10 else None
+        model = forecaster().fit(df)
+        _cache_call("set", key, model.to_json(), settings.GLUCOSE_MODEL_CACHE_SECONDS)
+        return model
+    finally:
+        if acquired:
+            _cache_call("delete", lock_key)
+
+
+def forecast_slots(future_hours):
+    # Naive UTC, like the training data from fetch_user_glucose_data
+    now_rounded = datetime.now(dt_timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    return [now_rounded + timedelta(hours=2 * i) for i in range(1, future_hours + 1)]
+
+
+def refresh_glucose_forecast(user, future_hours):
+    """
+    Forecasts the user's next future_hours two-hour slots and replaces their stored
+    GlucoseForecast rows. Returns the number of slots stored, or 0 without enough data.
+    """
+    forecaster = get_forecaster()
+    model = get_fitted_model(user, glucose_data_watermark(user), forecaster)
+    if model is None:
+        return 0
+
+    predictions = model.predict(forecast_slots(future_hours))
+    generated_at = now()
+    rows = [
+        GlucoseForecast(
+            user=user, slot_start=row.ds.to_pydatetime().replace(tzinfo=dt_timezone.utc),
+            yhat=row.yhat, yhat_lower=row.yhat_lower, yhat_upper=row.yhat_upper,
+            forecaster=forecaster.name, generated_at=generated_at,
+        )
+        for row in predictions.itertuples()
+    ]
+    with transaction.atomic():
+        GlucoseForecast.objects.filter(user=user).delete()
+        GlucoseForecast.objects.bulk_create(rows)
+    return len(rows)
+
+
+def stored_glucose_forecast(user, future_hours):
+    """The user's precomputed forecast for upcoming slots, in predict_glucose's format, or None."""
+    forecasts = GlucoseForecast.objects.filter(user=user, slot_start__gt=now()).order_by("slot_start")[:future_hours]
+    predictions = [
+        {
+            "ds": f.slot_start.astimezone(dt_timezone.utc).replace(tzinfo=None),
+            "yhat": f.yhat, "yhat_lower": f.yhat_lower, "yhat_upper": f.yhat_upper,
+        }
+        for f in forecasts
+    ]
+    if len(predictions) < future_hours:
+        return None
+    return {"status": "success", "predictions": predictions}
 
 
 def predict_glucose(user, future_hours):
-    df = fetch_user_glucose_data(user)
-    if df is None:
+    forecaster = get_forecaster()
+    watermark = glucose_data_watermark(user)
+    slots = forecast_slots(future_hours)
+
+    # Forecasts only change with new data or the hour they start from
+    forecast_key = (
+        f"glucose_forecast:{forecaster.name}:{user.id}:{watermark}:{slots[0].isoformat()}:{future_hours}"
+    )
+    result = _cache_call("get", forecast_key)
+    if result is not None:
+        return result
+
+    model = get_fitted_model(user, watermark, forecaster)
+    if model is None:
         return {
             "status": "insufficient_data",
             "message": "Not enough historical glucose data to generate predictions."
         }
 
-    model = Prophet()
-    model.fit(df)
-
-    now_rounded = datetime.now().replace(minute=0, second=0, microsecond=0)
-
-    future_times = [now_rounded + timedelta(hours=2 * i) for i in range(1, future_hours + 1)]
-    future = pd.DataFrame({'ds': future_times})
-
-    forecast = model.predict(future)
-    predictions = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    predictions = model.predict(slots)
 
-    return {
+    result = {
         "status": "success",
         "predictions": predictions.to_dict(orient="records")
     }
+    _cache_call("set", forecast_key, result, 3600)
+    return result
@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from core.models import ChatMessage, ConversationMemory
+from core.services.llm_gateway import chat_completion
+
+# The virtual coach sees a user's chat as a rolling summary plus the most recent messages that fit
+# in COACH_CONTEXT_TOKENS, so its prompt stays the same size however long the conversation gets.
+
+SUMMARY_MODEL = "gpt-3.5-turbo"
+
+# The window never holds more messages than the coach used to be sent
+MAX_WINDOW_MESSAGES = 50
+
+
+def estimate_tokens(text):
+    """Rough token count of a chat message: about four characters per token plus the per-message overhead."""
+    return len(text) // 4 + 4
+
+
+def after(timestamp, message_id):
+    """Filter for messages after the (timestamp, id) position; a position without an id covers its whole timestamp."""
+    if message_id is None:
+        return Q(timestamp__gt=timestamp)
+    return Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id)
+
+
+def before(message):
+    return Q(timestamp__lt=message.timestamp) | Q(timestamp=message.timestamp, id__lt=message.id)
+
+
+def unsummarized(user_id, memory):
+    """The user's messages the summary in memory (None if there is none yet) does not cover, in no particular order."""
+    messages = ChatMessage.objects.filter(user_id=user_id)
+    if memory and memory.summarized_until:
+        messages = messages.filter(after(memory.summarized_until, memory.summarized_until_id))
+    return messages
+
+
+def recent_window(user_id):
+    """The user's newest ChatMessages that fit in COACH_CONTEXT_TOKENS, oldest first. The newest is always included."""
+    window, used = [], 0
+    newest_first = (
+        ChatMessage.objects.filter(user_id=user_id).order_by("-timestamp", "-id").only("sender", "message", "timestamp")
+    )
+    for message in newest_first[:MAX_WINDOW_MESSAGES]:
+        used += estimate_tokens(message.message)
+        if window and used > settings.COACH_CONTEXT_TOKENS:
+            break
+        window.append(message)
+    return window[::-1]
+
+
+def coach_context(user_id):
+    """
+    The chat so far as prompt messages: the summary of older messages, then every message it does not
+    cover yet in order. Those are the recent window plus any that left it before the summary caught up,
+    such as the one the last exchange pushed out, up to MAX_WINDOW_MESSAGES in all.
+    """
+    memory = ConversationMemory.objects.filter(user_id=user_id).first()
+    window = recent_window(user_id)
+    pending = []
+    if window and len(window) < MAX_WINDOW_MESSAGES:
+        pending = list(
+            unsummarized(user_id, memory).filter(before(window[0]))
+            .order_by("-timestamp", "-id").only("sender", "message", "timestamp")[:MAX_WINDOW_MESSAGES - len(window)]
+        )[::-1]
+
+    messages = []
+    if memory and memory.summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{memory.summary}"})
+    messages.extend({"role": message.sender, "content": message.message} for message in pending + window)
+    return messages
+
+
+def summarize(summary, messages):
+    """summary rewritten to also cover messages, in about COACH_SUMMARY_TOKENS."""
+    transcript = "\n".join(f"{message.sender}: {message.message}" for message in messages)
+    prompt = f"""
+    Current summary:
+    {summary or "None yet."}
+
+    New messages:
+    {transcript}
+
+    Rewrite the summary so it also covers the new messages, in at most {settings.COACH_SUMMARY_TOKENS * 3 // 4} words.
+    Keep health details, goals, advice already given and anything still unresolved.
+    """
+    return chat_completion(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You keep a running summary of a diabetic user's conversation with their virtual health coach."},
+            {"role": "user", "content": prompt},
+        ],
+        use_cache=False,
+    ).strip()
+
+
+def evicted_batch(user_id, memory, window_start):
+    """
+    The oldest messages before window_start that the summary in memory does not cover yet, up to
+    about COACH_CONTEXT_TOKENS of them, oldest first.
+    """
+    evicted = unsummarized(user_id, memory).filter(before(window_start)).order_by("timestamp", "id")
+
+    batch, used = [], 0
+    for message in evicted.iterator():
+        batch.append(message)
+        used += estimate_tokens(message.message)
+        if used >= settings.COACH_CONTEXT_TOKENS:
+            break
+    return batch
+
+
+def update_conversation_memory(user_id):
+    """
+    Fold the messages that have left the recent window into the summary. After an exchange that is
+    normally the oldest one or two messages, so each update is one small LLM call; a long backlog
+    (the first update of an existing chat) is folded in window-sized batches.
+
+    The LLM is called outside any transaction. Each new summary is saved only if the summary's
+    position has not moved meanwhile; if another update got there first, the work is dropped and
+    the rest of the backlog is picked up from the memory it saved.
+    """
+    window = recent_window(user_id)
+    if not window:
+        return
+    ConversationMemory.objects.get_or_create(user_id=user_id)
+
+    while True:
+        memory = ConversationMemory.objects.get(user_id=user_id)
+        batch = evicted_batch(user_id, memory, window[0])
+        if not batch:
+            return
+        summary = summarize(memory.summary, batch)
+
+        with transaction.atomic():
+            current = ConversationMemory.objects.select_for_update().get(user_id=user_id)
+            position = (current.summarized_until, current.summarized_until_id)
+            if position != (memory.summarized_until, memory.summarized_until_id):
+                continue
+            current.summary = summary
+            current.summarized_until = batch[-1].timestamp
+            current.summarized_until_id = batch[-1].id
+            current.save()
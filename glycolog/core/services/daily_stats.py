@@ -0,0 +1,125 @@
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from core.models import DailyUserStats, FitnessActivity, GlucoseReading
+from core.partitioning import day_range
+
+# DailyUserStats keeps one row per user and local day with the sums and counts behind every
+# fitness and glucose average, so a week or month of trends is a 7- or 30-row read.
+
+# Rolled-up model -> the timestamp that decides which day a row counts towards
+ROLLED_UP = {FitnessActivity: "start_time", GlucoseReading: "timestamp"}
+
+STAT_FIELDS = [
+    "activity_count", "steps", "calories_burned", "distance_km", "heart_rate_sum", "heart_rate_count",
+    "sleep_hours_sum", "sleep_count", "glucose_sum", "glucose_count", "glucose_min", "glucose_max",
+]
+
+# The activities generate_health_trends has always counted: no fallback records and no sleep.
+# The dashboard's day totals and the insight prompts' steps and heart rate read the same rows.
+VALID_ACTIVITY = Q(is_fallback=False) & ~Q(activity_type__iexact="sleep")
+
+
+def local_day(value):
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localdate(value)
+
+
+def row_day(instance):
+    """(user_id, local day) a FitnessActivity or GlucoseReading is rolled up into."""
+    return instance.user_id, local_day(getattr(instance, ROLLED_UP[type(instance)]))
+
+
+def stored_row_day(instance):
+    """row_day of the version of instance currently in the database, or None if it is new."""
+    if instance.pk is None:
+        return None
+    model = type(instance)
+    stored = model.objects.filter(pk=instance.pk).values_list("user_id", ROLLED_UP[model]).first()
+    return (stored[0], local_day(stored[1])) if stored else None
+
+
+def refresh_daily_stats(user_id, first_day, last_day=None):
+    """
+    Recompute the user's rows for first_day to last_day from the raw tables with one grouped
+    query per table and upsert them in one statement. Days left without data lose their row.
+    """
+    last_day = last_day or first_day
+    start, end = day_range(first_day, last_day)
+    days = {}
+
+    activities = (
+        FitnessActivity.objects
+        .filter(user_id=user_id, start_time__gte=start, start_time__lt=end)
+        .annotate(day=TruncDate("start_time"))
+        .values("day")
+        .annotate(
+            activity_count=Count("id", filter=VALID_ACTIVITY),
+            steps=Coalesce(Sum("steps", filter=VALID_ACTIVITY), 0),
+            calories_burned=Coalesce(Sum("calories_burned", filter=VALID_ACTIVITY), 0.0),
+            distance_km=Coalesce(Sum("distance_km", filter=VALID_ACTIVITY), 0.0),
+            heart_rate_sum=Coalesce(Sum("heart_rate", filter=VALID_ACTIVITY), 0.0),
+            heart_rate_count=Count("heart_rate", filter=VALID_ACTIVITY),
+            sleep_hours_sum=Coalesce(Sum("total_sleep_hours"), 0.0),
+            sleep_count=Count("total_sleep_hours"),
+        )
+        .order_by()
+    )
+    readings = (
+        GlucoseReading.objects
+        .filter(user_id=user_id, timestamp__gte=start, timestamp__lt=end)
+        .annotate(day=TruncDate("timestamp"))
+        .values("day")
+        .annotate(
+            glucose_sum=Sum("glucose_level"), glucose_count=Count("id"),
+            glucose_min=Min("glucose_level"), glucose_max=Max("glucose_level"),
+        )
+        .order_by()
+    )
+    for row in [*activities, *readings]:
+        days.setdefault(row.pop("day"), {}).update(row)
+
+    rows = [DailyUserStats(user_id=user_id, date=day, **stats) for day, stats in days.items()]
+    DailyUserStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=["user", "date"], update_fields=STAT_FIELDS + ["updated_at"],
+    )
+    # Every field is rewritten on conflict, so a day that lost its readings keeps its activity totals and vice versa
+    DailyUserStats.objects.filter(user_id=user_id, date__range=(first_day, last_day)).exclude(date__in=days).delete()
+
+
+def daily_stats(user, first_day, last_day):
+    """The user's DailyUserStats rows for first_day to last_day, keyed by date. Days without data are absent."""
+    rows = DailyUserStats.objects.filter(user=user, date__range=(first_day, last_day))
+    return {row.date: row for row in rows}
+
+
+def _ratio(total, count):
+    return total / count if count else None
+
+
+def period_summary(user, first_day=None, last_day=None):
+    """Totals and averages over the user's days from first_day to last_day (either bound optional)."""
+    rows = DailyUserStats.objects.filter(user=user)
+    if first_day is not None:
+        rows = rows.filter(date__gte=first_day)
+    if last_day is not None:
+        rows = rows.filter(date__lte=last_day)
+
+    totals = rows.aggregate(
+        days=Count("id"), glucose_min=Min("glucose_min"), glucose_max=Max("glucose_max"),
+        **{field: Sum(field) for field in STAT_FIELDS if field not in ("glucose_min", "glucose_max")},
+    )
+    return {
+        "days": totals["days"],
+        "activity_count": totals["activity_count"] or 0,
+        "steps": totals["steps"] or 0,
+        "calories_burned": totals["calories_burned"] or 0,
+        "distance_km": totals["distance_km"] or 0,
+        "avg_heart_rate": _ratio(totals["heart_rate_sum"], totals["heart_rate_count"]),
+        "avg_sleep_hours": _ratio(totals["sleep_hours_sum"], totals["sleep_count"]),
+        "avg_glucose": _ratio(totals["glucose_sum"], totals["glucose_count"]),
+        "glucose_count": totals["glucose_count"] or 0,
+        "glucose_min": totals["glucose_min"],
+        "glucose_max": totals["glucose_max"],
+    }
@@ -0,0 +1,89 @@
+from django.db.models import Avg, Count, Exists, Max, Min, OuterRef
+from core.models import GlucoseCheck, GlucoseLog, GlucoseReading
+
+# Query API over GlucoseReading, the combined GlucoseLog + GlucoseCheck time series.
+# Every read is a single query on the (user, timestamp) index.
+
+BATCH_SIZE = 2000
+
+
+def readings_in_range(user, start=None, end=None):
+    """The user's readings with start <= timestamp <= end (either bound optional), oldest first."""
+    readings = GlucoseReading.objects.filter(user=user)
+    if start is not None:
+        readings = readings.filter(timestamp__gte=start)
+    if end is not None:
+        readings = readings.filter(timestamp__lte=end)
+    return readings.order_by("timestamp")
+
+
+def latest_reading(user):
+    return GlucoseReading.objects.filter(user=user).order_by("-timestamp").first()
+
+
+def reading_stats(user, start=None, end=None):
+    """Count, mean, min and max over every reading in the window, whichever table it came from."""
+    return readings_in_range(user, start, end).order_by().aggregate(
+        count=Count("id"), avg=Avg("glucose_level"), min=Min("glucose_level"), max=Max("glucose_level")
+    )
+
+
+def reading_counts(user_ids, start=None):
+    """Readings per user since start for many users at once, as {user_id: count}."""
+    readings = GlucoseReading.objects.filter(user_id__in=user_ids)
+    if start is not None:
+        readings = readings.filter(timestamp__gte=start)
+    return dict(readings.values_list("user_id").annotate(count=Count("id")).order_by())
+
+
+def sync_reading(source, source_id, user_id, timestamp, glucose_level):
+    GlucoseReading.objects.update_or_create(
+        source=source, source_id=source_id,
+        defaults={"user_id": user_id, "timestamp": timestamp, "glucose_level": glucose_level},
+    )
+
+
+def remove_reading(source, source_id):
+    GlucoseReading.objects.filter(source=source, source_id=source_id).delete()
+
+
+def resync_readings(user_id=None):
+    """
+    Rebuild GlucoseReading from GlucoseLog and GlucoseCheck, for one user or everyone, for rows
+    the signals never saw: batch upserts of every source row, then deletes of readings whose
+    source row is gone. Returns (upserted, removed).
+    """
+    logs = GlucoseLog.objects.values_list("logID", "user_id", "timestamp", "glucose_level")
+    checks = GlucoseCheck.objects.values_list("id", "session__user_id", "timestamp", "glucose_level")
+    readings = GlucoseReading.objects.all()
+    if user_id is not None:
+        logs, checks = logs.filter(user_id=user_id), checks.filter(session__user_id=user_id)
+        readings = readings.filter(user_id=user_id)
+
+    upserted = 0
+    for source, rows in (("log", logs), ("check", checks)):
+        batch = []
+        for source_id, owner_id, timestamp, glucose_level in rows.order_by().iterator(chunk_size=BATCH_SIZE):
+            batch.append(GlucoseReading(
+                user_id=owner_id, timestamp=timestamp, glucose_level=glucose_level,
+                source=source, source_id=source_id,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                upserted += _upsert_readings(batch)
+                batch = []
+        upserted += _upsert_readings(batch)
+
+    orphaned = (
+        readings.filter(source="log").exclude(Exists(GlucoseLog.objects.filter(logID=OuterRef("source_id"))))
+        | readings.filter(source="check").exclude(Exists(GlucoseCheck.objects.filter(id=OuterRef("source_id"))))
+    )
+    removed, _ = orphaned.delete()
+    return upserted, removed
+
+
+def _upsert_readings(batch):
+    GlucoseReading.objects.bulk_create(
+        batch, update_conflicts=True, unique_fields=["source", "source_id"],
+        update_fields=["user", "timestamp", "glucose_level"],
+    )
+    return len(batch)
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from openai import AsyncOpenAI, OpenAI
+from core.services.llm_recordings import load_recording, save_recording
+
+logger = logging.getLogger(__name__)
+
+# Every chat completion in the app goes through chat_completion(), which serves repeated
+# prompts from a response cache keyed on (model, normalized messages, parameters).
+# LLM_BACKEND decides what answers a cache miss (see settings.py).
+
+LLM_BACKENDS = ("openai", "stub", "record", "replay")
+
+# How long the in-process fallback is used before Redis is tried again
+REDIS_RETRY_SECONDS = 30
+
+_client = None
+_async_client = None
+_cache = None
+_memory_cache = None
+_redis_retry_at = 0.0
+_lock = threading.Lock()
+
+
+def client_options():
+    """OpenAI client arguments for LLM_BACKEND; the stub speaks the same API at LLM_STUB_URL."""
+    if settings.LLM_BACKEND not in LLM_BACKENDS:
+        raise ImproperlyConfigured(f"LLM_BACKEND must be one of {', '.join(LLM_BACKENDS)}, not {settings.LLM_BACKEND!r}")
+    if settings.LLM_BACKEND == "stub":
+        return {"base_url": settings.LLM_STUB_URL, "api_key": "stub"}
+    return {}
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = OpenAI(**client_options())
+    return _client
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(**client_options())
+    return _async_client
+
+
+def normalize_messages(messages):
+    """Messages with role case and whitespace runs folded, so re-indented prompts share a key."""
+    return [
+        {"role": message["role"].lower(), "content": " ".join(str(message["content"]).split())}
+        for message in messages
+    ]
+
+
+def cache_key(model, messages, params):
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "params": params},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryResponseCache:
+    """Per-process LRU cache with a TTL, used when Redis is not reachable."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def incr(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def counts(self):
+        with self.lock:
+            return dict(self.counters), len(self.entries)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+
+class RedisResponseCache:
+    """
+    Cache shared by every worker. Entries expire through Redis TTLs; a sorted set of last-use
+    times evicts the least recently used once there are more than max_entries. Members for
+    expired entries are dropped from the set so it keeps matching what is actually cached.
+    """
+
+    PREFIX = "llm:response:"
+    LRU_KEY = "llm:lru"
+    STATS_KEY = "llm:stats"
+
+    def __init__(self, connection, max_entries, ttl):
+        self.redis = connection
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.redis.get(self.PREFIX + key)
+        if raw is None:
+            self.redis.zrem(self.LRU_KEY, key)
+            return None
+        self.redis.zadd(self.LRU_KEY, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key, value):
+        pipe = self.redis.pipeline()
+        pipe.set(self.PREFIX + key, json.dumps(value), ex=self.ttl)
+        pipe.zadd(self.LRU_KEY, {key: time.time()})
+        self.prune_expired(pipe)
+        pipe.zcard(self.LRU_KEY)
+        overflow = pipe.execute()[-1] - self.max_entries
+        if overflow > 0:
+            evicted = [member for member, _ in self.redis.zpopmin(self.LRU_KEY, overflow)]
+            self.redis.delete(*(self.PREFIX + member.decode() for member in evicted))
+
+    def prune_expired(self, pipe):
+        # An entry unused for a whole TTL has expired, since it was stored no later than its last use
+        pipe.zremrangebyscore(self.LRU_KEY, "-inf", f"({time.time() - self.ttl}")
+
+    def incr(self, counter, amount=1):
+        self.redis.hincrbyfloat(self.STATS_KEY, counter, amount)
+
+    def counts(self):
+        counters = {name.decode(): float(value) for name, value in self.redis.hgetall(self.STATS_KEY).items()}
+        pipe = self.redis.pipeline()
+        self.prune_expired(pipe)
+        pipe.zcard(self.LRU_KEY)
+        return counters, pipe.execute()[-1]
+
+    def reset(self):
+        self.redis.delete(self.STATS_KEY)
+
+
+def get_cache():
+    """
+    The shared Redis cache when LLM_CACHE_REDIS_URL is reachable, otherwise the in-process one.
+    While on the fallback, Redis is probed again every REDIS_RETRY_SECONDS.
+    """
+    global _cache, _memory_cache, _redis_retry_at
+    with _lock:
+        if isinstance(_cache, RedisResponseCache):
+            return _cache
+        if _memory_cache is None:
+            _memory_cache = MemoryResponseCache(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS)
+        _cache = _memory_cache
+        if settings.LLM_CACHE_REDIS_URL and time.monotonic() >= _redis_retry_at:
+            try:
+                connection = redis.Redis.from_url(
+                    settings.LLM_CACHE_REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5,
+                )
+                connection.ping()
+                _cache = RedisResponseCache(connection, settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS)
+            except redis.RedisError as e:
+                _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+                logger.warning("LLM cache: Redis unavailable (%s), using the in-process cache", e)
+        return _cache
+
+
+def _cached_content(key):
+    cache = get_cache()
+    try:
+        cached = cache.get(key)
+        if cached is None:
+            return None
+        cache.incr("hits")
+        cache.incr("saved_seconds", cached["latency"])
+        return cached["content"]
+    except redis.RedisError as e:
+        logger.warning("LLM cache read failed: %s", e)
+        return None
+
+
+def _store_content(key, content, latency):
+    cache = get_cache()
+    try:
+        cache.set(key, {"content": content, "latency": latency})
+        cache.incr("misses")
+        cache.incr("llm_seconds", latency)
+    except redis.RedisError as e:
+        logger.warning("LLM cache write failed: %s", e)
+
+
+def chat_completion(model, messages, use_cache=True, **params):
+    """
+    Text of a chat completion. The same model asked the same messages with the same parameters
+    within LLM_CACHE_TTL_SECONDS is answered from the cache without a round-trip.
+    """
+    key = cache_key(model, messages, params)
+    if use_cache:
+        cached = _cached_content(key)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    if settings.LLM_BACKEND == "replay":
+        recording = load_recording(key, model, messages)
+        time.sleep(recording["latency"])
+        content = recording["content"]
+    else:
+        response = get_client().chat.completions.create(model=model, messages=messages, **params)
+        content = response.choices[0].message.content
+    latency = time.perf_counter() - started
+
+    if settings.LLM_BACKEND == "record":
+        save_recording(key, model, messages, params, content, latency)
+    if use_cache:
+        _store_content(key, content, latency)
+    return content
+
+
+async def _replayed_stream(key, model, messages):
+    """A recorded response streamed word by word, spread over the time it originally took."""
+    recording = await sync_to_async(load_recording)(key, model, messages)
+    words = recording["content"].split(" ")
+    for index, word in enumerate(words):
+        await asyncio.sleep(recording["latency"] / len(words))
+        yield word if index == len(words) - 1 else word + " "
+
+
+async def _model_stream(model, messages, params):
+    stream = await get_async_client().chat.completions.create(model=model, messages=messages, stream=True, **params)
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+async def stream_chat_completion(model, messages, use_cache=True, **params):
+    """
+    Async generator over the text of a chat completion as the model produces it, for ASGI views.
+    Shares the cache with chat_completion(): a cached answer arrives as a single chunk, and a
+    streamed one is stored once the stream has finished.
+    """
+    key = cache_key(model, messages, params)
+    if use_cache:
+        cached = await sync_to_async(_cached_content)(key)
+        if cached is not None:
+            yield cached
+            return
+
+    started = time.perf_counter()
+    if settings.LLM_BACKEND == "replay":
+        deltas = _replayed_stream(key, model, messages)
+    else:
+        deltas = _model_stream(model, messages, params)
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+    latency = time.perf_counter() - started
+
+    if settings.LLM_BACKEND == "record":
+        await sync_to_async(save_recording)(key, model, messages, params, "".join(parts), latency)
+    if use_cache:
+        await sync_to_async(_store_content)(key, "".join(parts), latency)
+
+
+def cache_stats():
+    """Hit rate and the LLM time the cache has saved since the counters were last reset."""
+    counters, entries = get_cache().counts()
+    hits, misses = int(counters.get("hits", 0)), int(counters.get("misses", 0))
+    return {
+        "backend": "redis" if isinstance(get_cache(), RedisResponseCache) else "memory",
+        "entries": entries,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+        "saved_seconds": counters.get("saved_seconds", 0.0),
+        "llm_seconds": counters.get("llm_seconds", 0.0),
+    }
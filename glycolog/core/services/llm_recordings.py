@@ -0,0 +1,44 @@
+import hashlib
+import json
+from pathlib import Path
+from django.conf import settings
+
+# Responses saved under LLM_BACKEND="record" and served back under "replay", one JSON file per
+# request in LLM_RECORDINGS_DIR/<prompt shape>/<cache key>.json.
+
+
+class RecordingNotFound(LookupError):
+    pass
+
+
+def prompt_shape(model, messages):
+    """Groups recordings by model and opening message, which every prompt builder keeps constant."""
+    first = " ".join(str(messages[0]["content"]).split()) if messages else ""
+    return hashlib.sha256(f"{model}\n{first}".encode()).hexdigest()[:16]
+
+
+def recording_path(key, model, messages):
+    return Path(settings.LLM_RECORDINGS_DIR) / prompt_shape(model, messages) / f"{key}.json"
+
+
+def save_recording(key, model, messages, params, content, latency):
+    path = recording_path(key, model, messages)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(
+        {"model": model, "messages": messages, "params": params, "content": content, "latency": latency},
+        indent=2, ensure_ascii=False,
+    ))
+
+
+def load_recording(key, model, messages):
+    """
+    The recording of exactly this request. Prompts embed dates and live data, so when there is none
+    a recording from the same prompt builder is picked by key instead, keeping replays deterministic.
+    """
+    path = recording_path(key, model, messages)
+    if not path.exists():
+        candidates = sorted(path.parent.glob("*.json"))
+        if not candidates:
+            raise RecordingNotFound(f"No recorded {model} response for this prompt in {path.parent}; record some with LLM_BACKEND=record")
+        path = candidates[int(key, 16) % len(candidates)]
+    return json.loads(path.read_text())
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A stand-in for the OpenAI chat completions API, for load testing without the network. Replies
+# are derived from a hash of the request, so the same prompt always gets the same answer, and
+# are paced like a real model: a fixed time to first token, then a steady rate of tokens.
+
+WORDS = [
+    "glucose", "levels", "walk", "after", "meals", "steady", "sleep", "hydration", "fibre", "carbohydrates",
+    "activity", "heart", "rate", "steps", "routine", "evening", "morning", "monitor", "trend", "stable",
+    "improve", "consider", "light", "exercise", "rest", "balanced", "portions", "insulin", "check", "daily",
+]
+
+
+def stub_reply(model, messages, tokens):
+    """
+    Deterministic reply of about `tokens` words, as "[priority] sentence" bullets so the same
+    parsing as real answers (parse_ai_summary_with_scores) applies.
+    """
+    seed = hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode()).digest()
+    rng = random.Random(seed)
+    bullets, written = [], 0
+    while written < tokens:
+        length = rng.randint(8, 14)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        bullets.append(f"[{rng.randint(1, 3)}] {sentence.capitalize()}.")
+        written += length
+    return "\n".join(bullets)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Overridden per server by make_stub_server()
+    first_token_seconds = 0.5
+    tokens_per_second = 30.0
+    reply_tokens = 120
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "glycolog"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model, messages = request.get("model", "stub"), request.get("messages", [])
+        words = stub_reply(model, messages, self.reply_tokens).split(" ")
+        completion_id = "chatcmpl-stub-" + hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:24]
+
+        time.sleep(self.first_token_seconds)
+        if request.get("stream"):
+            self.stream(completion_id, model, words)
+            return
+
+        time.sleep(len(words) / self.tokens_per_second)
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        self.send_json({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)},
+        })
+
+    def stream(self, completion_id, model, words):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            body = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode())
+            self.wfile.flush()
+
+        for index, word in enumerate(words):
+            chunk({"role": "assistant", "content": word} if index == 0 else {"content": " " + word})
+            time.sleep(1 / self.tokens_per_second)
+        chunk({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def send_json(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_stub_server(host, port, first_token_seconds, tokens_per_second, reply_tokens):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "first_token_seconds": first_token_seconds,
+        "tokens_per_second": tokens_per_second,
+        "reply_tokens": reply_tokens,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
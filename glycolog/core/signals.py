@@ -1,11 +1,66 @@
 import threading
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from core.models import QuestionnaireSession
+from core.models import FitnessActivity, GlucoseCheck, GlucoseLog, GlucoseReading, QuestionnaireSession
+from core.ml_utils import store_session_features
+from core.services.daily_stats import refresh_daily_stats, row_day, stored_row_day
+from core.services.glucose_readings import remove_reading, sync_reading
+from core.tasks import enqueue_on_commit, refresh_symptom_predictions_task
 import subprocess
 
 _thread_local = threading.local()
 
+# GlucoseReading mirrors both glucose tables; bulk updates and raw SQL bypass these and need resync_glucose_readings
+@receiver(post_save, sender=GlucoseLog)
+def sync_glucose_log_reading(sender, instance, **kwargs):
+    sync_reading("log", instance.logID, instance.user_id, instance.timestamp, instance.glucose_level)
+
+@receiver(post_delete, sender=GlucoseLog)
+def remove_glucose_log_reading(sender, instance, **kwargs):
+    remove_reading("log", instance.logID)
+
+@receiver(post_save, sender=GlucoseCheck)
+def sync_glucose_check_reading(sender, instance, **kwargs):
+    sync_reading("check", instance.id, instance.session.user_id, instance.timestamp, instance.glucose_level)
+
+@receiver(post_delete, sender=GlucoseCheck)
+def remove_glucose_check_reading(sender, instance, **kwargs):
+    remove_reading("check", instance.id)
+
+# DailyUserStats rolls up activities and readings; bulk updates and raw SQL bypass these and need backfill_daily_stats
+def refresh_daily_stats_on_commit(*row_days):
+    # After commit, once cascades have run and the rows the rollup reads are final
+    for user_id, day in set(row_days) - {None}:
+        transaction.on_commit(lambda user_id=user_id, day=day: refresh_daily_stats(user_id, day))
+
+@receiver(pre_save, sender=FitnessActivity)
+@receiver(pre_save, sender=GlucoseReading)
+def remember_rolled_up_day(sender, instance, **kwargs):
+    # A save can move the row to another day, which then needs recomputing as well
+    instance._stored_row_day = stored_row_day(instance)
+
+@receiver(post_save, sender=FitnessActivity)
+@receiver(post_save, sender=GlucoseReading)
+def refresh_rolled_up_day(sender, instance, **kwargs):
+    refresh_daily_stats_on_commit(row_day(instance), getattr(instance, "_stored_row_day", None))
+
+@receiver(post_delete, sender=FitnessActivity)
+@receiver(post_delete, sender=GlucoseReading)
+def refresh_rolled_up_day_after_delete(sender, instance, **kwargs):
+    refresh_daily_stats_on_commit(row_day(instance))
+
+@receiver(post_save, sender=QuestionnaireSession)
+def store_completed_session_features(sender, instance, **kwargs):
+    if not instance.completed:
+        return
+
+    # Appends this session's row to the feature store so retraining never recomputes it
+    store_session_features(instance)
+
+    # New sessions change which symptoms are explained, so refresh the stored predictions
+    enqueue_on_commit(refresh_symptom_predictions_task, instance.user_id)
+
 @receiver(post_save, sender=QuestionnaireSession)
 def trigger_model_retrain(sender, instance, created, **kwargs):
     if not instance.completed:
@@ -1,36 +1,68 @@
 from datetime import timedelta
+import logging
+from django.conf import settings
 from django.utils.timezone import now
 from celery import shared_task
 import subprocess
-from django.db import models
+from django.core.management import call_command
+from django.db import models, transaction
 from core.models import CustomUser, FitnessActivity, AIRecommendation
-from core.fitness_ai import generate_ai_recommendation, generate_health_trends
+from core.fitness_ai import activity_fingerprint, generate_ai_recommendation, generate_health_trends, recommendation_activities
+from core.ml_utils import materialize_symptom_predictions
+from core.model_registry import read_model_version
+from core.services.conversation_memory import update_conversation_memory
+from core.services.daily_stats import daily_stats
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_on_commit(task, *args):
+    """
+    Queue task(*args) once the current transaction commits. Requests only use this for
+    follow-up work, so a broker outage is logged and delays it rather than failing the request.
+    """
+    def send():
+        try:
+            # No publish retries: an unreachable broker fails at once instead of stalling the response
+            task.apply_async(args=args, retry=False)
+        except Exception:
+            logger.exception("Could not queue %s for %s", task.name, args)
+
+    transaction.on_commit(send)
+
+
+def sleep_hours(day):
+    """Average reported sleep for a DailyUserStats day, 0 when nothing reported any."""
+    return day.sleep_hours_sum / day.sleep_count if day.sleep_count else 0
 
 
 def generate_health_insight_prompts(user_id=None):
     users = [CustomUser.objects.get(id=user_id)] if user_id else CustomUser.objects.all()
     for user in users:
         prompts = []
-        recent_activities = FitnessActivity.objects.filter(user=user, start_time__gte=now() - timedelta(days=7))
+        today = now().date()
+        week = daily_stats(user, today - timedelta(days=7), today)
 
-        poor_sleep_days = [a for a in recent_activities if (a.total_sleep_hours or 0) < 5]
-        low_activity_days = [a for a in recent_activities if (a.steps or 0) < 2000]
+        poor_sleep_days = [day for day in week.values() if sleep_hours(day) < 5]
+        low_activity_days = [day for day in week.values() if day.steps < 2000]
 
         if len(poor_sleep_days) >= 2 and len(low_activity_days) >= 2:
             prompts.append("We've noticed multiple days with poor sleep and low activity. Try light walking and hydrating.")
 
-        today = now().date()
-        today_activities = FitnessActivity.objects.filter(user=user, start_time__date=today)
+        today_stats = week.get(today)
 
-        total_steps = today_activities.aggregate(models.Sum("steps"))['steps__sum'] or 0
+        total_steps = today_stats.steps if today_stats else 0
         if total_steps < 3000:
             prompts.append("Your step count is low today. Take a quick 10-minute walk to stay active.")
 
-        avg_sleep = today_activities.aggregate(models.Avg("total_sleep_hours"))['total_sleep_hours__avg'] or 0
+        avg_sleep = sleep_hours(today_stats) if today_stats else 0
         if avg_sleep < 6:
             prompts.append("You're averaging less than 6 hours of sleep. Aim for better rest tonight.")
 
-        avg_heart_rate = today_activities.aggregate(models.Avg("heart_rate"))['heart_rate__avg']
+        avg_heart_rate = (
+            today_stats.heart_rate_sum / today_stats.heart_rate_count
+            if today_stats and today_stats.heart_rate_count else None
+        )
         if avg_heart_rate and avg_heart_rate > 100:
             prompts.append("Your heart rate is elevated today. Consider deep breathing or a short rest.")
 
@@ -50,16 +82,75 @@ def generate_ai_recommendations(user_id=None):
             recommendation = generate_ai_recommendation(user, latest_activities)
             AIRecommendation.objects.create(user=user, recommendation_text=recommendation)
 
+
 @shared_task
 def send_push_notification(user_id, title, message):
     print(f"PUSH to {user_id}: {title} - {message}")
-    
+
+
 @shared_task
 def send_medication_reminder(user_id, medication_name):
     print(f"Reminder: Time to take {medication_name} for User {user_id}")
     return f"Reminder sent for {medication_name}"
 
+
+@shared_task
+def refresh_ai_recommendation_task(user_id):
+    user = CustomUser.objects.get(id=user_id)
+    activities = recommendation_activities(user)
+    fingerprint = activity_fingerprint(activities)
+
+    def already_generated():
+        latest = AIRecommendation.objects.filter(user=user).order_by("-generated_at").first()
+        return latest is not None and latest.activity_fingerprint == fingerprint
+
+    if already_generated():
+        return
+
+    # The model is called without holding a lock; the user row then serialises the re-check and
+    # the save, so two workers racing on the same activities store one recommendation
+    recommendation_text = generate_ai_recommendation(user, activities)
+    with transaction.atomic():
+        CustomUser.objects.select_for_update().filter(id=user_id).first()
+        if already_generated():
+            return
+        recommendation = AIRecommendation.objects.create(
+            user=user,
+            recommendation_text=recommendation_text,
+            activity_fingerprint=fingerprint,
+        )
+        recommendation.fitness_activities.set(activities)
+
+
+@shared_task
+def refresh_symptom_predictions_task(user_id):
+    user = CustomUser.objects.get(id=user_id)
+    materialize_symptom_predictions(user, read_model_version(user_id))
+
+
 @shared_task
 def retrain_all_user_models_task():
-    subprocess.run(["python", "manage.py", "retrain_all_user_models"])
-    return "✅ User models retrained"
\ No newline at end of file
+    # Runs as a subprocess because Celery's daemonic workers cannot start the process pool
+    subprocess.run(["python", "manage.py", "retrain_all_user_models", "--workers", str(settings.RETRAIN_WORKERS)])
+    return "✅ User models retrained"
+
+
+@shared_task
+def forecast_all_users_task():
+    # Runs as a subprocess for the same reason as the retrain task
+    subprocess.run(["python", "manage.py", "forecast_all_users", "--workers", str(settings.RETRAIN_WORKERS)])
+    return "✅ Glucose forecasts refreshed"
+
+
+@shared_task
+def update_conversation_memory_task(user_id):
+    # Runs after each coach reply so the summary absorbs the messages that just left the window
+    update_conversation_memory(user_id)
+
+
+@shared_task
+def maintain_partitions_task():
+    # Next months' partitions first, so the archive run never leaves inserts without one
+    call_command("maintain_partitions", freeze=True)
+    call_command("archive_partitions")
+    return "✅ Partitions maintained"
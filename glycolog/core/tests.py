@@ -1,3 +1,442 @@
-from django.test import TestCase
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+import numpy as np
+import redis
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from core.model_cache import SymptomModelCache
+from core.fitness_ai import activity_fingerprint, recommendation_activities
+from core.models import (
+    AIRecommendation, ChatMessage, ConversationMemory, CustomUser, FitnessActivity, GlucoseLog, GlucoseReading,
+)
+from core.parallel import chunked, run_chunks
+from core.prediction.forecasters import RidgeForecaster
+from core.prediction.glucose_prediction import get_fitted_model, glucose_data_watermark
+from core.query_plans import force_index_plans, hot_queries, plan_problems
+from core.services import conversation_memory, llm_gateway
+from core.services.downsampling import lttb_indices
+from core.tasks import refresh_ai_recommendation_task
 
 # Create your tests here.
+
+
+def make_user(username="alice"):
+    return CustomUser.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pw", first_name="A", last_name="B"
+    )
+
+
+def label(text):
+    # Test chat messages start with their label, e.g. "m3 word word ..."
+    return text.split()[0]
+
+
+def square_chunk(chunk, crash_on):
+    # Pool worker for RunChunksTests; exiting without cleanup is how an OOM kill looks to the pool
+    if crash_on in chunk:
+        os._exit(1)
+    time.sleep(0.2)  # Still running when the other worker dies, so the crash breaks this chunk too
+    return [n * n for n in chunk]
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are checked against PostgreSQL, the production database")
+class HotQueryPlanTests(TestCase):
+    def test_hot_queries_use_their_composite_indexes(self):
+        # EXPLAIN needs no rows: the planner is forced onto index plans whenever one can serve the query
+        with connection.cursor() as cursor:
+            force_index_plans(cursor)
+            for query in hot_queries(user_id=1, thread_id=1):
+                with self.subTest(query["label"]):
+                    plan = query["queryset"].explain()
+                    self.assertEqual(plan_problems(cursor, query, plan), [], plan)
+
+
+class RunChunksTests(SimpleTestCase):
+    def test_a_crashing_chunk_does_not_fail_the_others(self):
+        results = {
+            tuple(chunk): future
+            for chunk, future in run_chunks("core.tests.square_chunk", chunked(range(12), 3), 2, 0)
+        }
+        self.assertEqual(sorted(results), [(0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11)])
+        self.assertIsInstance(results[(0, 1, 2)].exception(), BrokenProcessPool)
+        for chunk in [(3, 4, 5), (6, 7, 8), (9, 10, 11)]:
+            self.assertEqual(results[chunk].result(), [n * n for n in chunk])
+
+
+class SymptomModelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.latest = {}  # user id -> sha256 of their latest published model
+        self.loads = []
+        registry = mock.patch.multiple(
+            "core.model_cache.model_registry",
+            latest=lambda user_id, kind: SimpleNamespace(sha256=self.latest[user_id]) if user_id in self.latest else None,
+            load=self.load,
+        )
+        registry.start()
+        self.addCleanup(registry.stop)
+        # Every model counts as 100 bytes in memory
+        sizes = mock.patch("core.model_cache.model_nbytes", return_value=100)
+        sizes.start()
+        self.addCleanup(sizes.stop)
+
+    def load(self, artifact):
+        self.loads.append(artifact.sha256)
+        return {"models": {"Fatigue": artifact.sha256}, "trained_symptoms": ["Fatigue"]}
+
+    def test_repeat_lookups_hit_until_a_new_version_is_published(self):
+        cache = SymptomModelCache(max_bytes=1000)
+        self.latest[1] = "v1"
+        first = cache.get(1)
+        self.assertIs(cache.get(1), first)
+        self.assertEqual(self.loads, ["v1"])
+
+        self.latest[1] = "v2"
+        self.assertEqual(cache.get(1).models, {"Fatigue": "v2"})
+        self.assertEqual(self.loads, ["v1", "v2"])
+        self.assertEqual(cache.stats()["bytes"], 100)
+
+    def test_least_recently_used_models_are_evicted_over_the_byte_ceiling(self):
+        cache = SymptomModelCache(max_bytes=250)
+        for user_id in (1, 2):
+            self.latest[user_id] = f"user{user_id}"
+            cache.get(user_id)
+        cache.get(1)  # User 2 is now the least recently used
+        self.latest[3] = "user3"
+        cache.get(3)
+
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"], stats["evictions"]), (2, 200, 1))
+        cache.get(1)
+        cache.get(2)
+        self.assertEqual(self.loads, ["user1", "user2", "user3", "user2"])
+
+    def test_an_untrained_user_gets_none_and_their_entry_is_dropped(self):
+        cache = SymptomModelCache(max_bytes=1000)
+        self.latest[1] = "v1"
+        cache.get(1)
+        del self.latest[1]
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class CountingForecaster(RidgeForecaster):
+    fits = 0
+
+    def fit(self, df):
+        CountingForecaster.fits += 1
+        return super().fit(df)
+
+
+class GlucoseModelCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        CountingForecaster.fits = 0
+        self.user = make_user()
+        start = now() - timedelta(days=10)
+        for i in range(20):
+            self.add_reading(start + timedelta(hours=6 * i), 100 + i % 5 * 10)
+
+    def add_reading(self, timestamp, level):
+        source_id = GlucoseReading.objects.count() + 1
+        return GlucoseReading.objects.create(
+            user=self.user, timestamp=timestamp, glucose_level=level, source="log", source_id=source_id
+        )
+
+    def test_watermark_follows_the_readings_in_the_training_window(self):
+        watermark = glucose_data_watermark(self.user)
+        self.assertEqual(glucose_data_watermark(self.user), watermark)
+
+        # Readings older than the 90-day window are never trained on
+        self.add_reading(now() - timedelta(days=200), 150)
+        self.assertEqual(glucose_data_watermark(self.user), watermark)
+
+        reading = self.add_reading(now() - timedelta(hours=1), 150)
+        added = glucose_data_watermark(self.user)
+        self.assertNotEqual(added, watermark)
+
+        reading.glucose_level = 160
+        reading.save()
+        self.assertNotEqual(glucose_data_watermark(self.user), added)
+
+    def test_a_fit_is_reused_until_the_watermark_changes(self):
+        watermark = glucose_data_watermark(self.user)
+        first = get_fitted_model(self.user, watermark, CountingForecaster)
+        second = get_fitted_model(self.user, watermark, CountingForecaster)
+        self.assertEqual(CountingForecaster.fits, 1)
+        slot = [now().replace(tzinfo=None)]
+        self.assertEqual(second.predict(slot).yhat.tolist(), first.predict(slot).yhat.tolist())
+
+        self.add_reading(now() - timedelta(hours=1), 180)
+        get_fitted_model(self.user, glucose_data_watermark(self.user), CountingForecaster)
+        self.assertEqual(CountingForecaster.fits, 2)
+
+    def test_an_unreachable_cache_still_fits(self):
+        broken = mock.Mock(**{f"{method}.side_effect": ConnectionError("down") for method in ("get", "add", "set", "delete")})
+        with mock.patch("core.prediction.glucose_prediction.cache", broken):
+            model = get_fitted_model(self.user, glucose_data_watermark(self.user), CountingForecaster)
+        self.assertIsNotNone(model)
+        self.assertEqual(CountingForecaster.fits, 1)
+
+
+class LttbTests(SimpleTestCase):
+    def test_series_at_or_under_the_threshold_are_kept_whole(self):
+        self.assertEqual(lttb_indices([0, 1, 2], [5, 6, 7], 3).tolist(), [0, 1, 2])
+        self.assertEqual(lttb_indices([0, 1], [5, 6], 10).tolist(), [0, 1])
+
+    def test_threshold_below_three_is_rejected(self):
+        with self.assertRaises(ValueError):
+            lttb_indices(range(10), range(10), 2)
+
+    def test_downsampled_series_keeps_the_ends_and_the_extremes(self):
+        x = np.arange(1000)
+        y = 100 + 10 * np.sin(x / 50)
+        y[300], y[700] = 400, 40  # A spike and a low a chart must not lose
+        kept = lttb_indices(x, y, 50)
+
+        self.assertEqual(len(kept), 50)
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(kept) > 0))
+        self.assertIn(300, kept)
+        self.assertIn(700, kept)
+
+    def test_each_bucket_keeps_its_largest_triangle(self):
+        # Three buckets of two points between the ends; the outlier in each bucket wins
+        y = [0, 0, 9, 0, -9, 5, 0, 0]
+        self.assertEqual(lttb_indices(range(8), y, 5).tolist(), [0, 2, 4, 5, 7])
+
+
+class GlucoseLogPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Two timestamps shared by many logs, so pages break inside runs of equal timestamps
+        earlier, later = now() - timedelta(hours=2), now() - timedelta(hours=1)
+        for i in range(25):
+            log = GlucoseLog.objects.create(user=self.user, glucose_level=100 + i, meal_context="fasting")
+            GlucoseLog.objects.filter(pk=log.pk).update(timestamp=later if i % 2 else earlier)
+        self.expected = list(
+            GlucoseLog.objects.filter(user=self.user).order_by("-timestamp", "-logID").values_list("logID", flat=True)
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse("glucose-log"), params)
+
+    def test_following_next_cursor_returns_every_log_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            params = {"page_size": 4, **({"cursor": cursor} if cursor else {})}
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 200)
+            seen += [log["logID"] for log in response.data["logs"]]
+            cursor = response.data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_only_the_first_page_carries_the_history_summary(self):
+        first = self.get(page_size=4).data
+        self.assertAlmostEqual(first["averageLog"], 112)
+        self.assertEqual(first["lastLog"], first["logs"][0]["glucose_level"])
+        second = self.get(page_size=4, cursor=first["next_cursor"]).data
+        self.assertNotIn("averageLog", second)
+
+    def test_without_paging_params_the_whole_history_is_returned(self):
+        response = self.get()
+        self.assertEqual([log["logID"] for log in response.data["logs"]], self.expected)
+        self.assertNotIn("next_cursor", response.data)
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = self.get(page_size=4).data["next_cursor"]
+        for bad in (cursor[:-1], cursor.swapcase(), "not-a-cursor"):
+            with self.subTest(cursor=bad):
+                self.assertEqual(self.get(page_size=4, cursor=bad).status_code, 400)
+
+
+class RecommendationDedupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        start = now() - timedelta(hours=3)
+        FitnessActivity.objects.create(
+            user=self.user, activity_type="Walking", start_time=start, end_time=start + timedelta(minutes=30),
+            duration_minutes=30, steps=3000,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @mock.patch("core.tasks.generate_ai_recommendation", return_value="Walk after dinner.")
+    def test_unchanged_activities_are_not_sent_to_the_model_again(self, generate):
+        refresh_ai_recommendation_task(self.user.id)
+        refresh_ai_recommendation_task(self.user.id)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(AIRecommendation.objects.filter(user=self.user).count(), 1)
+
+    def test_a_recommendation_saved_by_another_worker_meanwhile_is_not_duplicated(self):
+        fingerprint = activity_fingerprint(recommendation_activities(self.user))
+
+        def racing_worker(user, activities):
+            # The other worker stores its recommendation while this one waits on the model
+            AIRecommendation.objects.create(user=user, recommendation_text="theirs", activity_fingerprint=fingerprint)
+            return "ours"
+
+        with mock.patch("core.tasks.generate_ai_recommendation", side_effect=racing_worker):
+            refresh_ai_recommendation_task(self.user.id)
+        self.assertEqual(
+            list(AIRecommendation.objects.filter(user=self.user).values_list("recommendation_text", flat=True)), ["theirs"]
+        )
+
+    @mock.patch("core.views.enqueue_on_commit")
+    def test_dashboard_queues_one_refresh_per_activity_set(self, enqueue):
+        for _ in range(3):
+            response = self.client.get(reverse("get_dashboard_summary"))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()["recommendation_pending"])
+        self.assertEqual(enqueue.call_count, 1)
+
+    @mock.patch("core.views.enqueue_on_commit")
+    def test_dashboard_survives_an_unreachable_cache(self, enqueue):
+        with mock.patch("core.views.cache.add", side_effect=ConnectionError("down")), self.assertLogs("core.views", "ERROR"):
+            response = self.client.get(reverse("get_dashboard_summary"))
+        self.assertEqual(response.status_code, 200)
+        enqueue.assert_not_called()
+
+
+@override_settings(LLM_BACKEND="openai", LLM_CACHE_REDIS_URL="", LLM_CACHE_TTL_SECONDS=60, LLM_CACHE_MAX_ENTRIES=2)
+class LlmResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        # A fresh process-wide cache per test
+        state = mock.patch.multiple(llm_gateway, _cache=None, _memory_cache=None, _redis_retry_at=0.0)
+        state.start()
+        self.addCleanup(state.stop)
+        self.prompts = []
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self.create)))
+        patcher = mock.patch.object(llm_gateway, "get_client", return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, model, messages, **params):
+        self.prompts.append(messages[-1]["content"])
+        reply = f"reply {len(self.prompts)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    def ask(self, content, **params):
+        return llm_gateway.chat_completion("gpt-4", [{"role": "user", "content": content}], **params)
+
+    def test_repeated_prompts_are_answered_from_the_cache(self):
+        self.assertEqual(self.ask("How is my glucose?"), "reply 1")
+        # Whitespace differences normalise to the same key
+        self.assertEqual(self.ask("  How is   my glucose? "), "reply 1")
+        self.assertEqual(self.ask("How is my glucose?", temperature=0.2), "reply 2")
+        self.assertEqual(self.ask("How is my glucose?", use_cache=False), "reply 3")
+
+        stats = llm_gateway.cache_stats()
+        self.assertEqual((stats["backend"], stats["hits"], stats["misses"]), ("memory", 1, 2))
+
+    def test_expired_entries_go_back_to_the_model(self):
+        self.ask("How is my glucose?")
+        cache = llm_gateway.get_cache()
+        for key, (expires_at, value) in list(cache.entries.items()):
+            cache.entries[key] = (expires_at - 61, value)  # As if LLM_CACHE_TTL_SECONDS had passed
+        self.assertEqual(self.ask("How is my glucose?"), "reply 2")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.ask("a")
+        self.ask("b")
+        self.ask("a")  # b is now the least recently used
+        self.ask("c")
+        self.ask("a")
+        self.ask("b")
+        self.assertEqual(self.prompts, ["a", "b", "c", "b"])
+
+    @override_settings(LLM_CACHE_REDIS_URL="redis://cache.invalid:6379/0")
+    def test_redis_is_probed_again_after_the_backoff(self):
+        down = mock.Mock(**{"ping.side_effect": redis.ConnectionError("down")})
+        with mock.patch.object(redis.Redis, "from_url", side_effect=[down, mock.Mock()]) as from_url, \
+                self.assertLogs("core.services.llm_gateway", "WARNING"):
+            self.assertIsInstance(llm_gateway.get_cache(), llm_gateway.MemoryResponseCache)
+            self.assertIsInstance(llm_gateway.get_cache(), llm_gateway.MemoryResponseCache)
+            self.assertEqual(from_url.call_count, 1)
+
+            llm_gateway._redis_retry_at = 0.0  # The backoff has passed
+            self.assertIsInstance(llm_gateway.get_cache(), llm_gateway.RedisResponseCache)
+            self.assertEqual(from_url.call_count, 2)
+
+
+@override_settings(COACH_CONTEXT_TOKENS=300)
+class ConversationMemoryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.start = now() - timedelta(hours=1)
+        self.folded = []  # Message labels in the order summarize() received them
+        patcher = mock.patch.object(conversation_memory, "summarize", side_effect=self.summarize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def summarize(self, summary, messages):
+        self.folded += [label(message.message) for message in messages]
+        return f"{len(self.folded)} messages"
+
+    def add_messages(self, first, count, second):
+        # About 50 tokens each, all at the same time, so cursors and window edges fall inside ties
+        for i in range(first, first + count):
+            message = ChatMessage.objects.create(user=self.user, sender="user", message=f"m{i} " + "word " * 40)
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=self.start + timedelta(seconds=second))
+
+    def prompt_labels(self):
+        return [label(message["content"]) for message in conversation_memory.coach_context(self.user.id)
+                if message["role"] != "system"]
+
+    def test_every_message_is_summarised_or_in_the_window_exactly_once(self):
+        self.add_messages(0, 20, second=0)
+        self.add_messages(20, 20, second=1)
+        conversation_memory.update_conversation_memory(self.user.id)
+
+        window = [label(message.message) for message in conversation_memory.recent_window(self.user.id)]
+        self.assertEqual(self.folded + window, [f"m{i}" for i in range(40)])
+        memory = ConversationMemory.objects.get(user=self.user)
+        self.assertEqual(memory.summary, f"{len(self.folded)} messages")
+        self.assertEqual(self.prompt_labels(), window)
+
+        # Nothing left to fold means no LLM call
+        folded = len(self.folded)
+        conversation_memory.update_conversation_memory(self.user.id)
+        self.assertEqual(len(self.folded), folded)
+
+    def test_messages_that_left_the_window_stay_in_the_prompt_until_folded(self):
+        self.add_messages(0, 10, second=0)
+        conversation_memory.update_conversation_memory(self.user.id)
+        self.add_messages(10, 2, second=1)
+
+        labels = self.prompt_labels()
+        self.assertEqual(labels, [f"m{i}" for i in range(len(self.folded), 12)])
+        self.assertLess(len(conversation_memory.recent_window(self.user.id)), len(labels))
+
+        conversation_memory.update_conversation_memory(self.user.id)
+        self.assertEqual(self.folded + self.prompt_labels(), [f"m{i}" for i in range(12)])
+
+    def test_a_summary_saved_meanwhile_by_another_update_wins(self):
+        self.add_messages(0, 10, second=0)
+        evicted = conversation_memory.evicted_batch(
+            self.user.id, None, conversation_memory.recent_window(self.user.id)[0]
+        )
+
+        def racing_update(summary, messages):
+            # Another worker folds the same batch while this one waits on the model
+            ConversationMemory.objects.filter(user=self.user).update(
+                summary="theirs", summarized_until=evicted[-1].timestamp, summarized_until_id=evicted[-1].id,
+            )
+            conversation_memory.summarize.side_effect = self.summarize
+            return "ours"
+
+        conversation_memory.summarize.side_effect = racing_update
+        conversation_memory.update_conversation_memory(self.user.id)
+        self.assertEqual(ConversationMemory.objects.get(user=self.user).summary, "theirs")
+        self.assertEqual(self.folded, [])
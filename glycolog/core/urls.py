@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import ( MedicationListView, MedicationReminderListView, bad_days_view, 
-    chat_with_virtual_coach, combined_glucose_timeline, complete_questionnaire, create_category, create_comment, create_thread, delete_medication, exercise_step, 
+    chat_with_virtual_coach, stream_chat_with_virtual_coach, combined_glucose_timeline, complete_questionnaire, create_category, create_comment, create_thread, delete_medication, exercise_step, 
     chat_history, fetch_medications_from_openfda, get_ai_health_trends, get_all_ai_health_trends, get_insights_summary_with_ai, get_last_synced_workout, get_predictive_feedback, get_quizset_quizzes, get_user_profile, get_user_profile_detail, glucose_prediction_view, latest_fitness_entry,
     get_medication_reminders, leaderboard, list_ai_recommendations,
     get_saved_medications, list_all_quizsets_and_progress, list_comments_for_thread, list_forum_categories, list_past_insights, list_quiz_attempts, list_threads_by_category, list_user_achievements, maybe_retrain_model, react_to_comment, submit_quiz, today_fitness_summary, meal_step, glucose_step, glycaemic_response_main,
@@ -60,6 +60,7 @@ urlpatterns = [
     path("dashboard/summary/", get_dashboard_summary, name="get_dashboard_summary"),
     path("dashboard/recommendations/", list_ai_recommendations, name="list_ai_recommendations"),
     path("dashboard/chat/", chat_with_virtual_coach, name="chat_with_virtual_coach"),
+    path("dashboard/chat/stream/", stream_chat_with_virtual_coach, name="stream_chat_with_virtual_coach"),
     path("dashboard/chat/history/", chat_history, name="chat_history"),
 
     # Health Data Sync
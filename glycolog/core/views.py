@@ -4,41 +4,52 @@ from django.db.models.signals import post_save
 from django.utils.timezone import now, timedelta
 import json
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils.dateparse import parse_time, parse_datetime
 import joblib
+import numpy as np
 import pandas as pd
 from django.db.models import Max
 import requests
 from rest_framework import status, viewsets
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db.models import Sum
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from django.conf import settings
-from core.fitness_ai import generate_ai_recommendation, generate_health_trends
+from django.core.cache import cache
+from core.fitness_ai import activity_fingerprint, generate_health_trends, recommendation_activities
 from core.services.ocr_service import extract_text_from_image, parse_dosage_info
 from core.services.openfda_service import fetch_openfda_drug_details, search_openfda_drugs
-from core.prediction.glucose_prediction import predict_glucose
-from core.ml_utils import explain_symptom_causes
+from core.prediction.glucose_prediction import predict_glucose, stored_glucose_forecast
+from core.pagination import InvalidCursor, keyset_page, page_size_from
+from core.partitioning import day_range
+from core.services.downsampling import lttb_indices
+from core.services.conversation_memory import coach_context
+from core.services.daily_stats import daily_stats, local_day, period_summary
+from core.services.glucose_readings import latest_reading, readings_in_range
+from core.services.llm_gateway import chat_completion, stream_chat_completion
+from core.tasks import enqueue_on_commit, refresh_ai_recommendation_task, refresh_symptom_predictions_task, update_conversation_memory_task
 from .serializers import ChatMessageSerializer, CommentSerializer, ExerciseCheckSerializer, FoodCategorySerializer, FoodItemSerializer, ForumCategorySerializer, ForumThreadSerializer, GlucoseCheckSerializer, GlucoseLogSerializer, MealCheckSerializer, MealSerializer, MedicationReminderSerializer, MedicationSerializer, PredictiveFeedbackSerializer, QuestionnaireSessionSerializer, RegisterSerializer, LoginSerializer, SettingsSerializer, SymptomCheckSerializer
-from .models import AIHealthTrend, AIRecommendation, Achievement, ChatMessage, Comment, CommentReaction, CustomUser, ExerciseCheck, FeelingCheck, FitnessActivity, FoodCategory, FoodItem, ForumCategory, ForumThread, GlucoseCheck, GlucoseLog, GlycaemicResponseTracker, Meal, MealCheck, Medication, MedicationReminder, PersonalInsight, PredictiveFeedback, QuestionnaireSession, Quiz, QuizAttempt, QuizSet, SymptomCheck, UserProfile, UserProgress  
+from .models import AIHealthTrend, AIRecommendation, Achievement, ChatMessage, Comment, CommentReaction, CustomUser, ExerciseCheck, FeelingCheck, FitnessActivity, FoodCategory, FoodItem, ForumCategory, ForumThread, GlucoseCheck, GlucoseLog, GlycaemicResponseTracker, Meal, MealCheck, Medication, MedicationReminder, PersonalInsight, PredictiveFeedback, QuestionnaireSession, Quiz, QuizAttempt, QuizSet, SymptomCheck, SymptomPrediction, UserProfile, UserProgress  
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import api_view, permission_classes
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.db.models import Avg, Count
-import openai
 import os
 from google_auth_oauthlib.flow import Flow
 import logging
 from googleapiclient.discovery import build
 from rest_framework.generics import ListAPIView
-from openai import OpenAI
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
 from channels.layers import get_channel_layer
 import re
 from django.core.management import call_command
@@ -46,15 +57,12 @@ from django.core.management import call_command
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
-client = OpenAI()
-# Load OpenAI API Key
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 
 def parse_date(date_str):
     try:
         return datetime.strptime(date_str, "%d-%m-%Y")
-    except ValueError:
+    except (TypeError, ValueError):  # Missing or malformed
         return None
 
 
@@ -138,8 +146,28 @@ def update_profile(request):
 def log_glucose(request):
     if request.method == 'GET':
         logs = GlucoseLog.objects.filter(user=request.user)  # Filter logs by the authenticated user
-        serializer = GlucoseLogSerializer(logs, many=True)
-        return Response({'logs': serializer.data}, status=status.HTTP_200_OK)
+        cursor = request.query_params.get("cursor")
+
+        # Without ?cursor= or ?page_size= the whole history is returned, as the Flutter screens expect
+        if cursor is None and "page_size" not in request.query_params:
+            serializer = GlucoseLogSerializer(logs.order_by("-timestamp", "-logID"), many=True)
+            return Response({'logs': serializer.data}, status=status.HTTP_200_OK)
+
+        # Newest first, one page at a time; pass next_cursor back as ?cursor= for the next page
+        try:
+            page, next_cursor = keyset_page(logs, cursor, page_size_from(request))
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = GlucoseLogSerializer(page, many=True)
+        data = {'logs': serializer.data, 'next_cursor': next_cursor}
+
+        # Summary over the whole history, which a page alone cannot give. Only the first page
+        # carries it, so following the cursor stays as cheap as the page itself.
+        if cursor is None:
+            data['lastLog'] = page[0].glucose_level if page else None
+            data['averageLog'] = logs.aggregate(average=Avg("glucose_level"))["average"]
+        return Response(data, status=status.HTTP_200_OK)
     
     elif request.method == 'POST':
         print("Incoming request data:", request.data)  # Log the incoming data to the console
@@ -167,7 +195,8 @@ def log_glucose(request):
 def glucose_log_history(request):
     """
     View to list or filter glucose logs for the authenticated user.
-    Supports filtering by date range and glucose level.
+    Supports filtering by date range and glucose level, newest first in
+    cursor-paginated pages (?cursor=, ?page_size=).
     """
     user = request.user  # Get the current authenticated user
     logs = GlucoseLog.objects.filter(user=user).order_by('-timestamp') # Get all logs for the user
@@ -195,9 +224,14 @@ def glucose_log_history(request):
         except ValueError:
             return Response({"error": "Invalid glucose level"}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        page, next_cursor = keyset_page(logs, request.GET.get("cursor"), page_size_from(request))
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     # Serialize the logs data
-    serializer = GlucoseLogSerializer(logs, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = GlucoseLogSerializer(page, many=True)
+    return Response({"results": serializer.data, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -210,15 +244,42 @@ def glucose_log_details(request, id):
     serializer = GlucoseLogSerializer(log)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+# Upper bound on ?max_points= for the glucose timeline
+MAX_TIMELINE_POINTS = 10000
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def combined_glucose_timeline(request):
+    """
+    The user's readings, oldest first, optionally limited to ?start=&end= (ISO datetimes).
+    Long series are downsampled with LTTB to at most ?max_points= readings, which keeps
+    the real readings that shape the chart (including peaks and lows).
+    """
     user = request.user
-    logs = GlucoseLog.objects.filter(user=user).values("glucose_level", "timestamp")
-    checks = GlucoseCheck.objects.filter(session__user=user).values("glucose_level", "timestamp")
+    try:
+        max_points = int(request.query_params.get("max_points", settings.GLUCOSE_TIMELINE_MAX_POINTS))
+    except ValueError:
+        return Response({"error": "max_points must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    if not 3 <= max_points <= MAX_TIMELINE_POINTS:
+        return Response(
+            {"error": f"max_points must be between 3 and {MAX_TIMELINE_POINTS}"}, status=status.HTTP_400_BAD_REQUEST
+        )
 
-    combined = list(logs) + list(checks)
-    combined_sorted = sorted(combined, key=lambda x: x["timestamp"])
+    bounds = {}
+    for param in ("start", "end"):
+        value = request.query_params.get(param)
+        if value:
+            bounds[param] = parse_datetime(value)
+            if bounds[param] is None:
+                return Response({"error": f"Invalid {param} datetime"}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = list(readings_in_range(user, bounds.get("start"), bounds.get("end")).values_list("timestamp", "glucose_level"))
+    if not rows:
+        return Response([], status=200)
+
+    timestamps, levels = zip(*rows)
+    keep = lttb_indices(np.array([t.timestamp() for t in timestamps]), levels, max_points)
+    combined_sorted = [{"glucose_level": levels[i], "timestamp": timestamps[i]} for i in keep]
 
     return Response(combined_sorted, status=200)
 
@@ -636,6 +697,9 @@ def questionnaire_data_visualization(request):
 
     return Response(data, status=200)
 
+# How long a queued dashboard recommendation regeneration blocks queueing another for the same activities
+RECOMMENDATION_QUEUE_SECONDS = 600
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_dashboard_summary(request):
@@ -643,22 +707,29 @@ def get_dashboard_summary(request):
     today = now()
     start_date = today - timedelta(days=7)
 
+    week_start, week_end = day_range(start_date.date(), today.date())
     activities = FitnessActivity.objects.filter(
-        user=user, start_time__date__range=[start_date.date(), today.date()]
+        user=user, start_time__gte=week_start, start_time__lt=week_end
     ).order_by("start_time")
 
+    # Per-day totals come from the rollup; the raw rows are only listed
+    stats = daily_stats(user, start_date.date(), today.date())
     trend_summary = {}
 
     for activity in activities:
-        date_str = activity.start_time.strftime("%Y-%m-%d")
+        day = local_day(activity.start_time)
+        date_str = day.isoformat()
 
         # Initialize per-date list
         if date_str not in trend_summary:
+            totals = stats.get(day)
             trend_summary[date_str] = {
-                "steps": 0,
-                "heart_rate": [],
-                "calories_burned": 0,
-                "distance_km": 0,
+                "steps": totals.steps if totals else 0,
+                "calories_burned": totals.calories_burned if totals else 0,
+                "distance_km": totals.distance_km if totals else 0,
+                "avg_heart_rate_for_day": (
+                    totals.heart_rate_sum / totals.heart_rate_count if totals and totals.heart_rate_count else None
+                ),
                 "activities": [],
             }
 
@@ -669,15 +740,8 @@ def get_dashboard_summary(request):
             "is_fallback": activity.is_fallback,
         }
 
-        # Only update these fields if it's not a fallback
+        # Only report these fields if it's not a fallback
         if not activity.is_fallback:
-            trend_summary[date_str]["steps"] += activity.steps or 0
-            trend_summary[date_str]["calories_burned"] += activity.calories_burned or 0
-            trend_summary[date_str]["distance_km"] += activity.distance_km or 0
-
-            if activity.heart_rate is not None:
-                trend_summary[date_str]["heart_rate"].append(activity.heart_rate)
-
             entry.update({
                 "steps": activity.steps or 0,
                 "calories_burned": activity.calories_burned or 0,
@@ -687,42 +751,39 @@ def get_dashboard_summary(request):
 
         trend_summary[date_str]["activities"].append(entry)
 
-    # Add average heart rate per day
-    for day, data in trend_summary.items():
-        rates = data["heart_rate"]
-        data["avg_heart_rate_for_day"] = (
-            sum(rates) / len(rates) if rates else None
-        )
-        del data["heart_rate"]
-
     # Glucose & AI stuff
-    latest_log = GlucoseLog.objects.filter(user=user).order_by("-timestamp").first()
-    latest_check = GlucoseCheck.objects.filter(session__user=user).order_by("-timestamp").first()
-
-    if latest_log and (not latest_check or latest_log.timestamp > latest_check.timestamp):
-        latest_glucose_value = latest_log.glucose_level
-        latest_glucose_time = latest_log.timestamp
-    elif latest_check:
-        latest_glucose_value = latest_check.glucose_level
-        latest_glucose_time = latest_check.timestamp
-    else:
-        latest_glucose_value = None
-        latest_glucose_time = None
-
-    avg_log = GlucoseLog.objects.filter(user=user).aggregate(Avg("glucose_level"))["glucose_level__avg"] or 0
-    avg_check = GlucoseCheck.objects.filter(session__user=user).aggregate(Avg("glucose_level"))["glucose_level__avg"] or 0
-    avg_glucose_level = round((avg_log + avg_check) / 2, 2) if (avg_log or avg_check) else None
-
-    recent_activities = FitnessActivity.objects.filter(user=user).order_by("-start_time")[:5]
-    ai_response = generate_ai_recommendation(user, recent_activities)
-    ai_recommendation = AIRecommendation.objects.create(user=user, recommendation_text=ai_response)
-    ai_recommendation.fitness_activities.set(recent_activities)
+    latest = latest_reading(user)
+    latest_glucose_value = latest.glucose_level if latest else None
+    latest_glucose_time = latest.timestamp if latest else None
+
+    # Mean over every reading, not the mean of the two tables' means
+    avg = period_summary(user)["avg_glucose"]
+    avg_glucose_level = round(avg, 2) if avg is not None else None
+
+    # Serve the latest stored recommendation; regenerate it in the background only once the
+    # activities it was generated from have changed
+    fingerprint = activity_fingerprint(recommendation_activities(user))
+    ai_recommendation = AIRecommendation.objects.filter(user=user).order_by("-generated_at").first()
+    recommendation_pending = ai_recommendation is None or ai_recommendation.activity_fingerprint != fingerprint
+    # cache.add queues one regeneration per activity set however often the dashboard reloads
+    if recommendation_pending:
+        try:
+            queue = cache.add(f"ai-recommendation:{user.id}:{fingerprint}", True, RECOMMENDATION_QUEUE_SECONDS)
+        except Exception:
+            # The task re-checks the fingerprint under a lock, so the worst case is a skipped refresh
+            logger.exception("Could not check the recommendation queue for user %s", user.id)
+            queue = False
+        if queue:
+            enqueue_on_commit(refresh_ai_recommendation_task, user.id)
+    ai_response = ai_recommendation.recommendation_text if ai_recommendation else None
 
     latest_fitness = FitnessActivity.objects.filter(user=user, is_fallback=False).order_by("-start_time").first()
     total_exercise_sessions = FitnessActivity.objects.filter(user=user, activity_type="Exercise").count()
 
     return JsonResponse({
         "recommendation": ai_response,
+        "recommendation_generated_at": ai_recommendation.generated_at.isoformat() if ai_recommendation else None,
+        "recommendation_pending": recommendation_pending,
         "glucose_summary": (
             f"{latest_glucose_time.strftime('%Y-%m-%d %H:%M')}: {latest_glucose_value} mg/dL"
             if latest_glucose_value else "No recent glucose data."
@@ -841,9 +902,10 @@ def today_fitness_summary(request):
     today = now().date()
 
     # Step 1: Get latest non-fallback activity for today
+    day_start, day_end = day_range(today)
     activity = (
         FitnessActivity.objects
-        .filter(user=user, start_time__date=today, is_fallback=False)
+        .filter(user=user, start_time__gte=day_start, start_time__lt=day_end, is_fallback=False)
         .order_by("-start_time")
         .first()
     )
@@ -851,9 +913,10 @@ def today_fitness_summary(request):
     # Step 2: If no activity found today, check yesterday
     if not activity:
         yesterday = today - timedelta(days=1)
+        day_start, day_end = day_range(yesterday)
         activity = (
             FitnessActivity.objects
-            .filter(user=user, start_time__date=yesterday, is_fallback=False)
+            .filter(user=user, start_time__gte=day_start, start_time__lt=day_end, is_fallback=False)
             .order_by("-start_time")
             .first()
         )
@@ -863,11 +926,13 @@ def today_fitness_summary(request):
 
     # Step 3: If activity has no sleep_hours, look for fallback sleep data
     if not activity.total_sleep_hours:
+        day_start, day_end = day_range(activity.start_time.date())
         sleep_fallback = (
             FitnessActivity.objects
             .filter(
                 user=user,
-                start_time__date=activity.start_time.date(),
+                start_time__gte=day_start,
+                start_time__lt=day_end,
                 is_fallback=True,
                 activity_type__icontains="sleep"
             )
@@ -946,17 +1011,11 @@ def get_last_synced_workout(request):
     return Response({"last_synced": last.end_time.isoformat()})
 
 
-client = OpenAI()
-
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-def chat_with_virtual_coach(request):
-    user = request.user
-    user_message = request.data.get("message")
+COACH_MODEL = "gpt-4"
 
-    if not user_message:
-        return JsonResponse({"error": "Message cannot be empty"}, status=400)
 
+def coach_conversation(user, user_message, client_unit=None):
+    """Store the user's chat message and build the messages the virtual coach is asked to answer."""
     ChatMessage.objects.create(user=user, sender="user", message=user_message)
    
     past_recommendations = AIRecommendation.objects.filter(user=user).order_by("-generated_at")[:5]
@@ -964,12 +1023,6 @@ def chat_with_virtual_coach(request):
         [f"{rec.recommendation_text} (given on {rec.generated_at.strftime('%Y-%m-%d')})" for rec in past_recommendations]
     ) if past_recommendations else "No past recommendations available."
 
-    past_messages = ChatMessage.objects.filter(user=user).order_by("-timestamp")[:50]
-    conversation_history = [
-        {"role": msg.sender, "content": msg.message} for msg in past_messages
-    ]
-
-    client_unit = request.data.get("unit")
     user_settings = getattr(user, "settings", None)
     preferred_unit = client_unit if client_unit in ["mg/dL", "mmol/L"] else (
         user_settings.glucose_unit if user_settings else "mg/dL"
@@ -990,22 +1043,100 @@ def chat_with_virtual_coach(request):
         "You analyze glucose levels, fitness data, and past recommendations to provide guidance."
     )
 
-    conversation_history.append({"role": "system", "content": system_message})
-    conversation_history.append({"role": "system", "content": f"Previously given recommendations:\n{recommendations_summary}"})
-    conversation_history.append({"role": "system", "content": glucose_summary})
-    conversation_history.append({"role": "user", "content": user_message})
+    conversation_history = [
+        {"role": "system", "content": system_message},
+        {"role": "system", "content": f"Previously given recommendations:\n{recommendations_summary}"},
+        {"role": "system", "content": glucose_summary},
+    ]
+    # Summary of the older chat, then the recent messages oldest first, ending with user_message
+    conversation_history.extend(coach_context(user.id))
+    return conversation_history
 
-    response = client.chat.completions.create(
-        model="gpt-4",
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def chat_with_virtual_coach(request):
+    user = request.user
+    user_message = request.data.get("message")
+
+    if not user_message:
+        return JsonResponse({"error": "Message cannot be empty"}, status=400)
+
+    conversation_history = coach_conversation(user, user_message, request.data.get("unit"))
+    ai_response = chat_completion(
+        model=COACH_MODEL,
         messages=conversation_history,
     )
-    ai_response = response.choices[0].message.content
 
     ChatMessage.objects.create(user=user, sender="assistant", message=ai_response)
+    enqueue_on_commit(update_conversation_memory_task, user.id)
 
     return JsonResponse({"response": ai_response})
 
 
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def authenticate_jwt(request):
+    """The user named by the request's Bearer token, or None. DRF authentication does not run for plain async views."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return result[0] if result else None
+
+
+@csrf_exempt
+@require_POST
+async def stream_chat_with_virtual_coach(request):
+    """
+    chat_with_virtual_coach for ASGI: the reply is streamed as server-sent events while the model
+    writes it, and the worker's event loop serves other requests in the meantime instead of a
+    sync worker being held for the whole completion.
+    Events: "data: {"delta": ...}" per chunk, then "event: done" with the full response, or "event: error".
+    """
+    user = await authenticate_jwt(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    user_message = payload.get("message")
+
+    if not user_message:
+        return JsonResponse({"error": "Message cannot be empty"}, status=400)
+
+    conversation_history = await sync_to_async(coach_conversation)(user, user_message, payload.get("unit"))
+
+    async def events():
+        parts = []
+        try:
+            async for delta in stream_chat_completion(model=COACH_MODEL, messages=conversation_history):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception:
+            # The detail stays in the log; it can carry provider or internal details the client must not see
+            logger.exception("Virtual coach stream failed for user %s", user.id)
+            yield sse_event({"error": "The virtual coach could not reply. Please try again."}, event="error")
+            return
+
+        # Only a completed reply is stored; a dropped client cancels the generator before this point
+        ai_response = "".join(parts)
+        await ChatMessage.objects.acreate(user=user, sender="assistant", message=ai_response)
+        await sync_to_async(enqueue_on_commit)(update_conversation_memory_task, user.id)
+        yield sse_event({"response": ai_response}, event="done")
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stops nginx buffering the stream until it ends
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def chat_history(request):
@@ -1388,8 +1519,6 @@ def create_category(request):
 
     return JsonResponse({"id": category.id, "message": "Category created"}, status=201)
 
-client = OpenAI()
-
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_insights_summary_with_ai(request):
@@ -1397,22 +1526,13 @@ def get_insights_summary_with_ai(request):
     today = now().date()
 
     # --- Glucose ---
-    latest_log = GlucoseLog.objects.filter(user=user).order_by("-timestamp").first()
-    latest_check = GlucoseCheck.objects.filter(session__user=user).order_by("-timestamp").first()
-
-    if latest_log and (not latest_check or latest_log.timestamp > latest_check.timestamp):
-        latest_glucose_value = latest_log.glucose_level
-        latest_glucose_time = latest_log.timestamp
-    elif latest_check:
-        latest_glucose_value = latest_check.glucose_level
-        latest_glucose_time = latest_check.timestamp
-    else:
-        latest_glucose_value = None
-        latest_glucose_time = None
+    latest = latest_reading(user)
+    latest_glucose_value = latest.glucose_level if latest else None
+    latest_glucose_time = latest.timestamp if latest else None
 
-    avg_log = GlucoseLog.objects.filter(user=user).aggregate(Avg("glucose_level"))["glucose_level__avg"] or 0
-    avg_check = GlucoseCheck.objects.filter(session__user=user).aggregate(Avg("glucose_level"))["glucose_level__avg"] or 0
-    avg_glucose_level = round((avg_log + avg_check) / 2, 2) if (avg_log or avg_check) else None
+    # Mean over every reading, not the mean of the two tables' means
+    avg = period_summary(user)["avg_glucose"]
+    avg_glucose_level = round(avg, 2) if avg is not None else None
 
     # --- Meals ---
     manual_meals_today = Meal.objects.filter(user=user, timestamp__date=today).count()
@@ -1425,9 +1545,10 @@ def get_insights_summary_with_ai(request):
     avg_weighted_gi = round(sum(weighted_gis) / len(weighted_gis), 2) if weighted_gis else None
 
     # --- Activity ---
-    fitness_logs = FitnessActivity.objects.filter(user=user).order_by("-start_time")[:7]
-    steps = [f.steps for f in fitness_logs if f.steps]
-    sleep = [f.total_sleep_hours for f in fitness_logs if f.total_sleep_hours]
+    # Daily figures over the last week
+    week = daily_stats(user, today - timedelta(days=6), today).values()
+    steps = [day.steps for day in week if day.steps]
+    sleep = [day.sleep_hours_sum / day.sleep_count for day in week if day.sleep_count]
 
     questionnaire_exercises = ExerciseCheck.objects.filter(session__user=user)
     exercise_sessions = questionnaire_exercises.count()
@@ -1472,15 +1593,13 @@ def get_insights_summary_with_ai(request):
     Highlight wellness, risks, and give at least 1 actionable tip.
     """
 
-    response = client.chat.completions.create(
+    ai_insight = chat_completion(
         model="gpt-4",
         messages=[
             {"role": "system", "content": "You are a diabetic health coach providing expert personalized feedback."},
             {"role": "user", "content": summary}
         ]
-    )
-
-    ai_insight = response.choices[0].message.content.strip()
+    ).strip()
 
     # Save insight to database
     PersonalInsight.objects.create(
@@ -1803,9 +1922,12 @@ def get_predictive_feedback(request):
         'predicted_symptoms': []
     }
 
-    model_path = os.path.join(settings.BASE_DIR, "ml_models", f"user_model_{user.id}.pkl")
-    explanation_results = explain_symptom_causes(user, n_sessions=10)
-    for result in explanation_results:
+    # Explanations are materialised when the model is trained or new sessions arrive
+    prediction = SymptomPrediction.objects.filter(user=user).first()
+    if prediction is None:
+        enqueue_on_commit(refresh_symptom_predictions_task, user.id)
+
+    for result in (prediction.predictions if prediction else []):
         converted = convert_units(result["reason"])
         summary["predicted_symptoms"].append({
             "symptom": result["symptom"],
@@ -1856,7 +1978,8 @@ def maybe_retrain_model(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def glucose_prediction_view(request):
-    result = predict_glucose(request.user, 6)
+    # Served from the nightly precomputed forecast; forecast on demand if it is missing or used up
+    result = stored_glucose_forecast(request.user, 6) or predict_glucose(request.user, 6)
     return Response(result)
 
 @api_view(["GET"])
@@ -3,6 +3,12 @@ ASGI config for glycolog project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it from an ASGI server so async views such as /dashboard/chat/stream/ wait on the LLM
+in the event loop rather than holding a worker. Both servers are in requirements.txt:
+
+    gunicorn glycolog.asgi:application -k uvicorn.workers.UvicornWorker   (production)
+    uvicorn glycolog.asgi:application                                      (development, any OS)
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -178,11 +178,85 @@ CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Redis for Django's cache, shared by every web and Celery process; it dedupes queued recommendation
+# refreshes and holds fitted forecasters. Unset keeps Django's per-process cache.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'glycolog',
+        }
+    }
+
+# Memory ceiling for the in-process cache of loaded per-user symptom models
+SYMPTOM_MODEL_CACHE_MAX_BYTES = int(os.getenv("SYMPTOM_MODEL_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Backend behind /glucose-prediction/: "prophet" or the NumPy "ridge" forecaster (core/prediction/forecasters.py)
+GLUCOSE_FORECASTER = os.getenv("GLUCOSE_FORECASTER", "prophet")
+
+# Readings returned by /glucose/combined-timeline/ when the client does not pass ?max_points=
+GLUCOSE_TIMELINE_MAX_POINTS = int(os.getenv("GLUCOSE_TIMELINE_MAX_POINTS", 1000))
+
+# Two-hour slots precomputed per user by the nightly forecast job; enough to cover a day after it runs
+GLUCOSE_FORECAST_SLOTS = int(os.getenv("GLUCOSE_FORECAST_SLOTS", 18))
+
+# How long a fitted glucose forecaster is cached; it is refit sooner whenever new readings arrive
+GLUCOSE_MODEL_CACHE_SECONDS = int(os.getenv("GLUCOSE_MODEL_CACHE_SECONDS", 7 * 24 * 3600))
+
+# Root of the versioned model registry and how many versions of each user's model it keeps
+MODEL_REGISTRY_ROOT = os.getenv("MODEL_REGISTRY_ROOT", os.path.join(BASE_DIR, "ml_models"))
+MODEL_REGISTRY_KEEP_VERSIONS = int(os.getenv("MODEL_REGISTRY_KEEP_VERSIONS", 2))
+
+# zlib level (0-9) used when writing symptom model artifacts
+MODEL_STORE_COMPRESSION = int(os.getenv("MODEL_STORE_COMPRESSION", 3))
+
+# "per-symptom" trains one forest per symptom; "multilabel" trains one multi-output forest per user
+SYMPTOM_MODEL_MODE = os.getenv("SYMPTOM_MODEL_MODE", "per-symptom")
+
+# Monthly partitions of the time-series tables created ahead of the current month (PostgreSQL only)
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", 3))
+
+# Months of history kept in the live tables before archive_partitions moves older partitions
+# to the archive schema; 0 keeps everything
+GLUCOSE_LOG_RETENTION_MONTHS = int(os.getenv("GLUCOSE_LOG_RETENTION_MONTHS", 24))
+FITNESS_ACTIVITY_RETENTION_MONTHS = int(os.getenv("FITNESS_ACTIVITY_RETENTION_MONTHS", 12))
+
+# Where LLM calls go: "openai"; "stub", the local stand-in started by run_llm_stub; "record", OpenAI
+# with every response also saved under LLM_RECORDINGS_DIR; "replay", those saved responses at their recorded latency
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8765/v1")
+LLM_RECORDINGS_DIR = os.getenv("LLM_RECORDINGS_DIR", os.path.join(BASE_DIR, "llm_recordings"))
+
+# Redis holding LLM responses shared by every worker; empty or unreachable falls back to a per-process cache
+LLM_CACHE_REDIS_URL = os.getenv("LLM_CACHE_REDIS_URL", CELERY_BROKER_URL)
+
+# How long an LLM response is reused for an identical prompt, and how many responses are kept
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+
+# Approximate tokens of recent chat sent verbatim to the virtual coach; older messages are
+# folded into a rolling summary kept to about COACH_SUMMARY_TOKENS
+COACH_CONTEXT_TOKENS = int(os.getenv("COACH_CONTEXT_TOKENS", 1500))
+COACH_SUMMARY_TOKENS = int(os.getenv("COACH_SUMMARY_TOKENS", 300))
+
+# Worker processes used by the scheduled retrain of every user's symptom models
+RETRAIN_WORKERS = int(os.getenv("RETRAIN_WORKERS", os.cpu_count() or 1))
+
 CELERY_BEAT_SCHEDULE = {
     'retrain-user-models-weekly': {
         'task': 'core.tasks.retrain_all_user_models_task',
         'schedule': crontab(hour=3, minute=0, day_of_week='sun'),
     },
+    'forecast-glucose-nightly': {
+        'task': 'core.tasks.forecast_all_users_task',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'maintain-partitions-monthly': {
+        'task': 'core.tasks.maintain_partitions_task',
+        'schedule': crontab(hour=4, minute=0, day_of_month='1'),
+    },
 }
 
 SIMPLE_JWT = {